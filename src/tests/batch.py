@@ -0,0 +1,82 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.getcwd()))
+
+from twisted.trial.unittest import TestCase
+from twisted.internet import defer
+from twisted.internet.task import Clock
+
+from txcron.scheduler import Scheduler
+from txcron.history import OUTCOME_SUCCESS, OUTCOME_FAILURE
+
+def refresh(key):
+    return 'single %s' % (key,)
+
+class BatchTestCase(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.sched = Scheduler(clock=self.clock)
+        self.batches = []
+        self.results = []
+
+    def tearDown(self):
+        for j in self.sched.getJobs():
+            j.cancel()
+
+    def refreshMany(self, arglist):
+        self.batches.append(arglist)
+        return ['bulk %s' % (args[0],) for args in arglist]
+
+    def addJobs(self, keys, batch_key='cache'):
+        jobs = []
+        for key in keys:
+            j = self.sched.addJob(60, refresh, key)
+            j.batch_key = batch_key
+            jobs.append(j)
+        return jobs
+
+    def test_coalesce(self):
+        self.sched.registerBatch('cache', self.refreshMany)
+        jobs = self.addJobs(['a', 'b', 'c'])
+        lone = self.addJobs(['d'], batch_key=None)[0]
+        self.clock.pump([0.1, 0])
+        self.assertEquals(self.batches, [[('a',), ('b',), ('c',)]])
+        self.assertEquals(self.sched.executions, 4)
+        self.assertEquals(self.sched.running, 0)
+        for j in jobs + [lone]:
+            self.assertEquals(j.history.getRecords()[0][3], OUTCOME_SUCCESS)
+            self.assertTrue(j._timer.active())
+
+    def test_max_size(self):
+        self.sched.registerBatch('cache', self.refreshMany, max_size=2)
+        self.addJobs(['a', 'b', 'c'])
+        self.clock.pump([0.1, 0])
+        self.assertEquals(map(len, self.batches), [2, 1])
+
+    def test_unregistered_key_runs_alone(self):
+        self.addJobs(['a'])
+        self.clock.advance(0.1)
+        self.assertEquals(self.batches, [])
+        self.assertEquals(self.sched.executions, 1)
+
+    def test_partial_failure(self):
+        def refreshSome(arglist):
+            return defer.succeed([KeyError(args[0]) if args[0] == 'b' else 1
+                                  for args in arglist])
+        self.sched.registerBatch('cache', refreshSome)
+        a, b = self.addJobs(['a', 'b'])
+        self.clock.pump([0.1, 0])
+        self.flushLoggedErrors(KeyError)
+        self.assertEquals(a.history.getRecords()[0][3], OUTCOME_SUCCESS)
+        self.assertEquals(b.history.getRecords()[0][3], OUTCOME_FAILURE)
+
+    def test_batch_failure(self):
+        def broken(arglist):
+            raise IOError('backend down')
+        self.sched.registerBatch('cache', broken)
+        jobs = self.addJobs(['a', 'b'])
+        self.clock.pump([0.1, 0])
+        self.flushLoggedErrors(IOError)
+        self.assertEquals(self.sched.running, 0)
+        self.assertEquals(len(self.sched.getRecentFailures()), 2)
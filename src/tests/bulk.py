@@ -0,0 +1,93 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.getcwd()))
+from datetime import datetime
+
+from twisted.trial.unittest import TestCase
+from twisted.internet.task import Clock
+
+from txcron.scheduler import Scheduler
+from txcron.ratelimit import DispatchLimiter
+
+class OneShotStoreTestCase(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.clock.advance(1000)
+        self.sched = Scheduler(clock=self.clock)
+        self.store = self.sched.oneshots
+        self.fired = []
+
+    def tearDown(self):
+        pass
+
+    def test_fires_in_order(self):
+        for t in (1500, 1010, 1200.5, 1010.25, 1100):
+            self.store.add(t, self.fired.append, t)
+        self.assertEquals(len(self.store), 5)
+        self.assertEquals(len(self.sched.timers), 1)
+        self.assertEquals(self.sched.getJobCount(), 0)
+        self.clock.pump([10, 0.25, 100, 100, 300])
+        self.assertEquals(self.fired, [1010, 1010.25, 1100, 1200.5, 1500])
+        self.assertEquals(len(self.store), 0)
+        self.assertEquals(self.sched.getJobCount(), 0)
+        self.assertEquals(len(self.sched.timers), 0)
+
+    def test_datetime_and_kwargs(self):
+        def remind(who, when=None):
+            self.fired.append((who, when))
+        self.store.add(datetime.fromtimestamp(1030), remind, 'a', when='now')
+        self.clock.advance(30)
+        self.assertEquals(self.fired, [('a', 'now')])
+        self.assertEquals(self.sched.executions, 1)
+
+    def test_add_many_and_cancel(self):
+        ids = self.store.addMany([(1000 + (i * 7) % 300, self.fired.append,
+                                   (i,)) for i in range(1000)])
+        self.assertTrue(self.store.cancel(ids[3]))
+        self.assertFalse(self.store.cancel(ids[3]))
+        self.assertEquals(len(self.store), 999)
+        self.assertEquals(self.store._payloads[ids[4]], ((4,), None))
+        self.clock.pump([1] * 300)
+        self.assertEquals(len(self.fired), 999)
+        self.assertFalse(3 in self.fired)
+        self.assertEquals(self.store._payloads, {})
+        self.assertEquals(len(self.store), 0)
+
+        # Entries that already fired can't be cancelled.
+        self.assertFalse(self.store.cancel(ids[5]))
+        self.assertEquals(len(self.store), 0)
+        self.assertRaises(KeyError, self.store.cancel, len(ids))
+
+    def test_scheduled_time_when_delayed(self):
+        sched = Scheduler(clock=self.clock, limiter=DispatchLimiter(1))
+        def broken(i):
+            raise KeyError(i)
+        for i in range(3):
+            sched.oneshots.add(1010, broken, i)
+        self.clock.pump([10] + [0.5] * 6)
+        self.flushLoggedErrors(KeyError)
+        failures = sched.getRecentFailures()
+        self.assertEquals(len(failures), 3)
+        self.assertEquals([f[1] for f in failures], [1010] * 3)
+        self.assertEquals(failures[0][2], 1012)
+
+    def test_clustered_adds(self):
+        # Adding to the earliest bucket out of order doesn't sort it,
+        # loading many entries due in one minute one by one stays linear.
+        times = [1020 + (i * 7919) % 600 / 10.0 for i in range(20000)]
+        for t in times:
+            self.store.add(t, self.fired.append, t)
+        bucket = self.store._getFirstBucket()
+        self.assertFalse(bucket.sorted)
+        self.assertEquals(self.sched.timers.getNextTime(), min(times))
+        self.clock.pump([20] + [1] * 60)
+        self.assertEquals(self.fired, sorted(times))
+
+    def test_add_while_firing_bucket(self):
+        self.store.add(1010, self.fired.append, 'a')
+        self.store.add(1050, self.fired.append, 'c')
+        self.clock.advance(10)
+        self.store.add(1030, self.fired.append, 'b')
+        self.clock.pump([20, 20])
+        self.assertEquals(self.fired, ['a', 'b', 'c'])
@@ -0,0 +1,114 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.getcwd()))
+
+from twisted.trial.unittest import TestCase
+from twisted.internet.task import Clock
+
+from txcron.scheduler import Scheduler, SchedulerError
+from txcron.crontab import CrontabLoader, CrontabError, parseCrontabLine
+
+class ParseCrontabLineTestCase(TestCase):
+
+    def test_parse(self):
+        self.assertEquals(parseCrontabLine('*/5 * * * *  run  --all\n'),
+                          ('*/5 * * * *', 'run  --all'))
+        self.assertEquals(parseCrontabLine('@hourly rotate'),
+                          ('@hourly', 'rotate'))
+
+    def test_skipped_lines(self):
+        for line in ('', '   \n', '# comment', 'MAILTO=root'):
+            self.assertEquals(parseCrontabLine(line), None)
+
+    def test_bad_lines(self):
+        self.assertRaises(CrontabError, parseCrontabLine, '* * * run')
+        self.assertRaises(CrontabError, parseCrontabLine, '@daily')
+
+class CrontabLoaderTestCase(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.sched = Scheduler(clock=self.clock)
+        self.path = self.mktemp()
+        self.loader = CrontabLoader(self.sched, self.path,
+                                    resolve=lambda command: lambda: command)
+
+    def tearDown(self):
+        self.loader.stop()
+        for j in self.sched.getJobs():
+            j.cancel()
+
+    def write(self, *lines):
+        f = open(self.path, 'w')
+        f.write('\n'.join(lines) + '\n')
+        f.close()
+
+    def test_load(self):
+        self.write('# jobs', '0 * * * * a', '@daily b', '@daily b')
+        self.assertEquals(self.loader.load(), (3, 0, 0))
+        self.assertEquals(len(self.sched.getJobs()), 3)
+        self.assertEquals(self.loader.getJob('b', 1).cron_string, '@daily')
+
+    def test_diff(self):
+        self.write('0 * * * * a', '@daily b', '@hourly c')
+        self.loader.load()
+        a = self.loader.getJob('a')
+        timer = a._timer
+        b = self.loader.getJob('b')
+        c = self.loader.getJob('c')
+
+        self.write('0 * * * * a', '30 2 * * * b', '@weekly d')
+        self.assertEquals(self.loader.load(), (1, 1, 1))
+        self.assertTrue(self.loader.getJob('a') is a)
+        self.assertTrue(a._timer is timer)
+        self.assertTrue(self.loader.getJob('b') is b)
+        self.assertEquals(b.cron_string, '30 2 * * *')
+        self.assertRaises(SchedulerError, self.sched.getJob, c.job_id)
+        self.assertEquals(len(self.sched.getJobs()), 3)
+
+    def test_bad_schedule_skipped(self):
+        self.write('0 * * * * a', '99 * * * * b')
+        self.assertEquals(self.loader.load(), (1, 0, 0))
+        self.assertEquals(self.loader.getJob('b'), None)
+
+    def test_bad_lines_dont_abort(self):
+        def resolve(command):
+            if command == 'boom':
+                raise RuntimeError(command)
+            return lambda: command
+        self.loader.resolve = resolve
+        self.write('5-3 * * * * a', '0 0 * * mon b', '* * * * * boom',
+                   '0 0 1 jan * c')
+        self.assertEquals(self.loader.load(), (2, 0, 0))
+        self.assertNotEquals(self.loader.getJob('b'), None)
+        self.assertNotEquals(self.loader.getJob('c'), None)
+
+    def test_removal_of_removed_job(self):
+        self.write(*['%d * * * * job%d' % (i, i) for i in range(20)])
+        self.loader.load()
+        self.sched.removeJob(self.loader.getJob('job3').job_id)
+        self.write()
+        self.assertEquals(self.loader.load(), (0, 0, 19))
+        self.assertEquals(self.sched.getJobCount(), 0)
+        self.assertEquals(self.loader.entries, {})
+
+    def test_watch_survives_errors(self):
+        self.write('0 * * * * a')
+        self.loader.interval = 5
+        self.loader.start()
+        def broken():
+            raise RuntimeError('boom')
+        self.loader.reload = broken
+        self.clock.advance(5)
+        self.assertEquals(len(self.flushLoggedErrors(RuntimeError)), 1)
+        self.assertTrue(self.loader._timer.active())
+
+    def test_watch(self):
+        self.write('0 * * * * a')
+        self.loader.interval = 5
+        self.loader.start()
+        self.assertEquals(self.loader.reload(), None)
+        self.write('0 * * * * a', '@daily b')
+        os.utime(self.path, (0, 0))
+        self.clock.advance(5)
+        self.assertNotEquals(self.loader.getJob('b'), None)
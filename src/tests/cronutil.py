@@ -4,7 +4,7 @@ sys.path.append(os.path.dirname(os.getcwd()))
 
 from twisted.trial.unittest import TestCase
 
-from txcron.cronutil import CronParser
+from txcron.cronutil import CronParser, CronOutOfBoundsError
 
 class CronParserTestCase(TestCase):
 
@@ -31,3 +31,18 @@ class CronParserTestCase(TestCase):
            of simple, step & range entries.
         """
         pass
+
+    def test_shortcut(self):
+        """Parse an @keyword shortcut"""
+        self.assertEquals(CronParser('@daily')._hours, [0])
+        self.assertRaises(ValueError, CronParser, '@fortnightly')
+
+    def test_names(self):
+        """Parse day and month names"""
+        parser = CronParser('0 0 * jan-Mar mon,FRIDAY')
+        self.assertEquals(parser._months, [1, 2, 3])
+        self.assertEquals(sorted(parser._dows), [1, 5])
+        self.assertRaises(ValueError, CronParser, '0 0 * * mo')
+
+    def test_reversed_range(self):
+        self.assertRaises(CronOutOfBoundsError, CronParser, '5-3 * * * *')
@@ -0,0 +1,82 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.getcwd()))
+
+from twisted.trial.unittest import TestCase
+from twisted.internet import defer
+from twisted.internet.task import Clock
+
+from txcron.scheduler import Scheduler, SchedulerError
+from txcron.jobs import DependentJob, TRIGGER_ALWAYS
+
+class DependentJobTestCase(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.sched = Scheduler(clock=self.clock)
+        self.calls = []
+
+    def tearDown(self):
+        for j in self.sched.getJobs():
+            j.cancel()
+
+    def test_runs_after_upstream(self):
+        a = self.sched.addJob(60, self.calls.append, 'a')
+        b = self.sched.addDependentJob([a], self.calls.append, 'b')
+        self.assertTrue(isinstance(b, DependentJob))
+        self.assertEquals(b._timer, None)
+        self.clock.advance(0.1)
+        self.assertEquals(self.calls, ['a', 'b'])
+        self.clock.advance(60)
+        self.assertEquals(self.calls, ['a', 'b', 'a', 'b'])
+
+    def test_waits_for_slow_upstream(self):
+        d = defer.Deferred()
+        a = self.sched.addJob(60, lambda: d)
+        b = self.sched.addDependentJob([a.job_id], self.calls.append, 'b')
+        self.clock.advance(30)
+        self.assertEquals(self.calls, [])
+        d.callback(None)
+        self.clock.advance(0)
+        self.assertEquals(self.calls, ['b'])
+
+    def test_fan_in(self):
+        a = self.sched.addJob(10, self.calls.append, 'a')
+        b = self.sched.addJob(20, self.calls.append, 'b')
+        self.clock.advance(0.1)
+        c = self.sched.addDependentJob([a, b], self.calls.append, 'c')
+        self.clock.advance(10)
+        self.assertEquals(self.calls, ['a', 'b', 'a'])
+        self.clock.advance(10)
+        self.assertEquals(sorted(self.calls[3:5]), ['a', 'b'])
+        self.assertEquals(self.calls[5:], ['c'])
+
+    def test_success_trigger(self):
+        a = self.sched.addJob(60, lambda: 1 / 0)
+        b = self.sched.addDependentJob([a], self.calls.append, 'b')
+        c = self.sched.addDependentJob([a], self.calls.append, 'c')
+        c.trigger = TRIGGER_ALWAYS
+        self.clock.advance(0.1)
+        self.clock.advance(0)
+        self.flushLoggedErrors(ZeroDivisionError)
+        self.assertEquals(self.calls, ['c'])
+
+    def test_chain_and_cycles(self):
+        a = self.sched.addJob(60, self.calls.append, 'a')
+        b = self.sched.addDependentJob([a], self.calls.append, 'b')
+        c = self.sched.addDependentJob([b], self.calls.append, 'c')
+        self.assertRaises(SchedulerError, b.reschedule, [c])
+        self.clock.advance(0.1)
+        self.assertEquals(self.calls, ['a', 'b', 'c'])
+
+    def test_remove_upstream(self):
+        a = self.sched.addJob(60, self.calls.append, 'a')
+        b = self.sched.addJob(60, self.calls.append, 'b')
+        c = self.sched.addDependentJob([a, b], self.calls.append, 'c')
+        self.sched.removeJob(b.job_id)
+        self.assertEquals(c.upstreams, set([a.job_id]))
+        self.clock.advance(0.1)
+        self.assertEquals(self.calls, ['a', 'c'])
+        self.sched.removeJob(c.job_id)
+        self.clock.advance(60)
+        self.assertEquals(self.calls, ['a', 'c', 'a'])
@@ -0,0 +1,40 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.getcwd()))
+
+from twisted.trial.unittest import TestCase
+
+from txcron.history import ExecutionHistory, FailureLog
+from txcron.history import OUTCOME_SUCCESS, OUTCOME_FAILURE, ERROR_LENGTH
+
+class ExecutionHistoryTestCase(TestCase):
+
+    def setUp(self):
+        self.history = ExecutionHistory(3)
+
+    def tearDown(self):
+        pass
+
+    def test_wraps_around(self):
+        for i in range(5):
+            self.history.record(i, i + 0.5, i + 1, OUTCOME_SUCCESS)
+        self.assertEquals(len(self.history), 3)
+        self.assertEquals(self.history.count, 5)
+        self.assertEquals([r[0] for r in self.history.getRecords()],
+                          [4, 3, 2])
+        self.assertEquals(len(self.history.getRecords(limit=2)), 2)
+
+    def test_failures(self):
+        self.history.record(1, 1, 2, OUTCOME_SUCCESS)
+        self.history.record(2, 2, 3, OUTCOME_FAILURE, 'x' * 500)
+        self.history.record(3, 3, 4, OUTCOME_SUCCESS)
+        failures = self.history.getFailures()
+        self.assertEquals(len(failures), 1)
+        self.assertEquals(failures[0][:4], (2, 2, 3, OUTCOME_FAILURE))
+        self.assertEquals(len(failures[0][4]), ERROR_LENGTH)
+
+    def test_failure_log(self):
+        log = FailureLog(2)
+        log.record(7, 1, 1, 2, OUTCOME_FAILURE, 'boom')
+        self.assertEquals(log.getRecords(),
+                          [(7, 1, 1, 2, OUTCOME_FAILURE, 'boom')])
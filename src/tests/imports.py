@@ -0,0 +1,57 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.getcwd()))
+import subprocess
+
+from twisted.trial.unittest import TestCase
+
+import txcron
+
+# Seconds the import of a module may take, best of IMPORT_RUNS fresh
+# interpreters.  Measured at roughly 5 ms and 150 ms.
+CRONUTIL_BUDGET = 0.05
+SCHEDULER_BUDGET = 1.0
+IMPORT_RUNS = 3
+
+SCRIPT = """
+import sys, time
+before = set(sys.modules)
+start = time.time()
+import %s
+print time.time() - start
+print ' '.join([m for m in set(sys.modules) - before if sys.modules[m]])
+"""
+
+def importModule(name):
+    """Imports name in a fresh interpreter.  Returns the seconds it took
+       and the modules it loaded.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(
+                            os.path.abspath(txcron.__file__)))
+    proc = subprocess.Popen([sys.executable, '-c', SCRIPT % (name,)],
+                            stdout=subprocess.PIPE, env=env)
+    out = proc.communicate()[0]
+    if proc.returncode:
+        raise RuntimeError("Importing %s failed" % (name,))
+    elapsed, modules = out.split('\n', 1)
+    return float(elapsed), modules.split()
+
+class ImportTestCase(TestCase):
+
+    def measure(self, name):
+        results = [importModule(name) for i in range(IMPORT_RUNS)]
+        return min([r[0] for r in results]), results[0][1]
+
+    def test_cronutil(self):
+        elapsed, modules = self.measure('txcron.cronutil')
+        self.assertEquals([m for m in modules
+                           if m.startswith(('twisted', 'zope'))], [])
+        self.assertTrue(elapsed < CRONUTIL_BUDGET,
+                        'txcron.cronutil took %.3fs' % (elapsed,))
+
+    def test_scheduler(self):
+        elapsed, modules = self.measure('txcron.scheduler')
+        self.assertNotIn('twisted.internet.reactor', modules)
+        self.assertTrue(elapsed < SCHEDULER_BUDGET,
+                        'txcron.scheduler took %.3fs' % (elapsed,))
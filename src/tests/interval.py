@@ -3,14 +3,42 @@ import sys
 sys.path.append(os.path.dirname(os.getcwd()))
 
 from twisted.trial.unittest import TestCase
+from twisted.internet import defer
+from twisted.internet.task import Clock
 
 from txcron.scheduler import Scheduler
 from txcron.jobs import IntervalJob
+from txcron.history import OUTCOME_TIMEOUT
 
 class IntervalJobTestCase(TestCase):
 
     def setUp(self):
-        pass
+        self.clock = Clock()
+        self.sched = Scheduler(clock=self.clock)
 
     def tearDown(self):
-        pass
+        for j in self.sched.getJobs():
+            j.cancel()
+
+    def test_timeout_reschedules(self):
+        cancelled = []
+        def hang():
+            return defer.Deferred(cancelled.append)
+        j = self.sched.addJob(60, hang)
+        j.timeout = 5
+        self.clock.advance(0.1)
+        self.assertEquals(self.sched.running, 1)
+        self.clock.advance(5)
+        self.flushLoggedErrors(defer.CancelledError)
+        self.assertEquals(len(cancelled), 1)
+        self.assertEquals(self.sched.running, 0)
+        self.assertEquals(j.history.getRecords()[0][3], OUTCOME_TIMEOUT)
+        self.assertTrue(j._timer.active())
+
+    def test_default_timeout(self):
+        self.sched.default_timeout = 5
+        j = self.sched.addJob(60, lambda: defer.succeed(None))
+        self.assertEquals(j.getTimeout(), 5)
+        self.clock.advance(0.1)
+        # Finished runs leave no timeout timer behind.
+        self.assertEquals(len(self.sched.timers), 1)
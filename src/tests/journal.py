@@ -0,0 +1,148 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.getcwd()))
+from StringIO import StringIO
+
+from twisted.trial.unittest import TestCase
+from twisted.internet.task import Clock
+
+from txcron.scheduler import Scheduler
+from txcron.history import OUTCOME_SUCCESS
+from txcron.journal import Journal, JournalReader, JournalError, main
+from txcron.journal import HEADER, RECORD, EVENT_SCHEDULE, EVENT_FIRE
+from txcron.journal import EVENT_COMPLETE, EVENT_CANCEL, EVENT_RESCHEDULE
+
+def noop(*args, **kwargs):
+    pass
+
+class JournalTestCase(TestCase):
+
+    def setUp(self):
+        self.path = self.mktemp()
+        self.clock = Clock()
+        self.clock.advance(1000)
+        self.journal = Journal(self.path, buffer_size=8)
+        self.sched = Scheduler(clock=self.clock, journal=self.journal)
+
+    def tearDown(self):
+        for j in self.sched.getJobs():
+            j.cancel()
+        self.journal.close()
+
+    def read(self):
+        self.journal.flush()
+        reader = JournalReader(self.path)
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_events(self):
+        # An IntervalJob's first run is due right away.
+        job = self.sched.addJob(10, noop)
+        self.clock.advance(0.1)
+        job.reschedule(20)
+        job.cancel()
+
+        records = list(self.read())
+        self.assertEquals([r[3] for r in records],
+                          [EVENT_SCHEDULE, EVENT_FIRE, EVENT_COMPLETE,
+                           EVENT_SCHEDULE, EVENT_RESCHEDULE, EVENT_CANCEL])
+        self.assertEquals(set([r[1] for r in records]), set([job.job_id]))
+        self.assertEquals(records[0][:3], (1000, job.job_id, 1000.1))
+        self.assertEquals(records[1][2], 1000.1)
+        self.assertEquals(records[2][4], OUTCOME_SUCCESS)
+        self.assertEquals(records[3][2], 1010.1)
+        self.assertEquals(records[4][2], 1010.1)
+
+    def test_finished_job_not_cancelled(self):
+        self.sched.addJob(5, noop, iterations=1)
+        self.clock.advance(0.1)
+        events = [r[3] for r in self.read()]
+        self.assertEquals(events,
+                          [EVENT_SCHEDULE, EVENT_FIRE, EVENT_COMPLETE])
+
+    def test_batched_writes(self):
+        for i in range(7):
+            self.journal.append(1000, EVENT_CANCEL, i)
+        self.assertEquals(os.path.getsize(self.path), HEADER.size)
+
+        # The eighth record fills the buffer.
+        self.journal.append(1000, EVENT_CANCEL, 7)
+        self.assertEquals(self.journal.written, 8)
+        self.journal.append(1000, EVENT_CANCEL, 8)
+        self.assertEquals(self.journal.written, 8)
+
+        self.clock.advance(self.journal.flush_interval)
+        self.assertEquals(self.journal.written, 9)
+        self.assertEquals(os.path.getsize(self.path),
+                          HEADER.size + 9 * RECORD.size)
+
+    def test_queries(self):
+        jobs = [self.sched.addJob(10, noop) for i in range(3)]
+        self.clock.advance(0.1)
+        reader = self.read()
+
+        self.assertEquals(len(reader), 12)
+        self.assertEquals(reader.countRecords(event=EVENT_FIRE), 3)
+        self.assertEquals(reader.countRecords(job_id=jobs[1].job_id), 4)
+        self.assertEquals(reader.countRecords(since=1000.1), 9)
+        self.assertEquals(reader.countRecords(until=1000.1), 3)
+        self.assertEquals(
+            [r[3] for r in reader.iterRecords(since=1000.1,
+                                              job_id=jobs[0].job_id)],
+            [EVENT_FIRE, EVENT_COMPLETE, EVENT_SCHEDULE])
+        self.assertEquals(reader[-1][0], 1000.1)
+        self.assertRaises(IndexError, reader.__getitem__, 12)
+
+    def test_reopen(self):
+        self.journal.append(1000, EVENT_SCHEDULE, 1, 1010)
+        self.journal.close()
+
+        # A torn record at the end is dropped when reopened.
+        f = open(self.path, 'ab')
+        f.write('\0' * 5)
+        f.close()
+
+        self.journal = Journal(self.path)
+        self.journal.append(2000, EVENT_CANCEL, 1)
+        self.assertEquals(len(self.read()), 2)
+        self.assertEquals(self.read()[1][:4], (2000, 1, 0, EVENT_CANCEL))
+
+    def test_not_a_journal(self):
+        path = self.mktemp()
+        f = open(path, 'wb')
+        f.write('* * * * * run\n' * 4)
+        f.close()
+        self.assertRaises(JournalError, Journal, path)
+        self.assertRaises(JournalError, JournalReader, path)
+
+    def test_closed(self):
+        self.journal.close()
+        self.assertRaises(JournalError, self.journal.append,
+                          0, EVENT_CANCEL, 1)
+
+    def test_scheduling_after_close(self):
+        job = self.sched.addJob(10, noop)
+        self.journal.close()
+        self.assertEquals(self.sched.journal, None)
+
+        self.sched.removeJob(job.job_id)
+        self.assertTrue(job._cancelled)
+        self.assertFalse(job._timer.active())
+        self.sched.addJob(10, noop)
+        self.assertEquals(len(self.read()), 1)
+
+    def test_main(self):
+        job = self.sched.addJob(10, noop)
+        self.clock.advance(0.1)
+        self.journal.flush()
+
+        out = StringIO()
+        main(['-c', '-e', 'fire', self.path], out)
+        self.assertEquals(out.getvalue(), '1\n')
+
+        out = StringIO()
+        main(['-j', str(job.job_id), '-n', '3', self.path], out)
+        lines = out.getvalue().splitlines()
+        self.assertEquals(len(lines), 3)
+        self.assertEquals(lines[2].split()[1:3], ['complete', str(job.job_id)])
+        self.assertEquals(lines[2].split()[-1], 'success')
@@ -0,0 +1,93 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.getcwd()))
+
+from twisted.trial.unittest import TestCase
+from twisted.internet.task import Clock
+
+from txcron.scheduler import Scheduler
+from txcron.ratelimit import TokenBucket, DispatchLimiter
+
+class TokenBucketTestCase(TestCase):
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(2, 3, 0)
+        self.assertEquals([bucket.consume(0) for i in range(4)],
+                          [True, True, True, False])
+        self.assertEquals(bucket.getDelay(0), 0.5)
+        self.assertTrue(bucket.consume(0.5))
+        self.assertFalse(bucket.consume(0.5))
+
+class DispatchLimiterTestCase(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.clock.advance(1000)
+        self.limiter = DispatchLimiter(10, burst=5)
+        self.sched = Scheduler(clock=self.clock, limiter=self.limiter)
+        self.calls = []
+
+    def tearDown(self):
+        for j in self.sched.getJobs():
+            j.cancel()
+
+    def test_smoothing(self):
+        for i in range(20):
+            self.sched.addJob(3600, self.calls.append, i)
+        self.clock.advance(0.1)
+        self.assertEquals(len(self.calls), 5)
+        self.assertEquals(self.limiter.getDepth(), 15)
+        self.clock.pump([0.1] * 10)
+        self.assertEquals(len(self.calls), 15)
+        self.clock.pump([0.1] * 5)
+        self.assertEquals(len(self.calls), 20)
+        self.assertEquals(self.limiter.getDepth(), 0)
+        self.assertAlmostEqual(self.limiter.max_wait, 1.5)
+
+    def test_fair_queue(self):
+        for i in range(10):
+            j = self.sched.addJob(3600, self.calls.append, 'bulk')
+            j.tag = 'bulk'
+        j = self.sched.addJob(3600, self.calls.append, 'urgent')
+        j.tag = 'urgent'
+        self.clock.pump([0.1] * 3)
+        self.assertEquals(self.calls[:6], ['bulk'] * 6)
+        self.assertEquals(self.calls[6], 'urgent')
+
+    def test_deadline_misfire(self):
+        self.limiter.deadline = 0.55
+        for i in range(20):
+            self.sched.addJob(3600, self.calls.append, i)
+        self.clock.pump([0.1] * 10)
+        self.assertEquals(len(self.calls), 10)
+        self.assertEquals(self.limiter.misfires, 10)
+        self.assertEquals(self.limiter.getDepth(), 0)
+        j = self.sched.getJob(20)
+        self.assertEquals(j.misfires, 1)
+        self.assertTrue(j._timer.active())
+
+    def test_resumed_while_queued(self):
+        limiter = DispatchLimiter(1, burst=1)
+        sched = Scheduler(clock=self.clock, limiter=limiter)
+        a = sched.addJob(3600, self.calls.append, 'a')
+        b = sched.addJob(3600, self.calls.append, 'b')
+        self.clock.advance(0.1)
+        self.assertEquals(limiter.getDepth(), 1)
+        b.pause()
+        b.resume()
+        self.clock.pump([0.1] * 20)
+        self.assertEquals(self.calls, ['a', 'b'])
+        self.assertEquals(b.times_executed, 1)
+        self.assertTrue(b._timer.active())
+        a.cancel()
+        b.cancel()
+
+    def test_priority(self):
+        for i in range(6):
+            self.sched.addJob(3600, self.calls.append, 'bulk')
+        j = self.sched.addJob(3600, self.calls.append, 'urgent')
+        j.priority = 10
+        self.clock.advance(0.1)
+        self.assertEquals(self.calls, ['urgent'] + ['bulk'] * 4)
+        self.clock.pump([0.1] * 2)
+        self.assertEquals(self.limiter.getDepth(), 0)
@@ -0,0 +1,102 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.getcwd()))
+
+from twisted.trial.unittest import TestCase
+from twisted.internet.task import Clock
+
+from txcron.scheduler import Scheduler
+from txcron.retry import RetryPolicy
+from txcron.ratelimit import TokenBucket
+from txcron.history import OUTCOME_SUCCESS, OUTCOME_FAILURE
+
+class RetryPolicyTestCase(TestCase):
+
+    def test_backoff(self):
+        policy = RetryPolicy(backoff=1, factor=2, max_delay=5, jitter=0)
+        self.assertEquals([policy.getDelay(n) for n in (1, 2, 3, 4)],
+                          [1, 2, 4, 5])
+
+    def test_jitter(self):
+        policy = RetryPolicy(backoff=10, jitter=0.5)
+        for i in range(20):
+            self.assertTrue(5 <= policy.getDelay(1) <= 10)
+
+class JobRetryTestCase(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.sched = Scheduler(clock=self.clock)
+        self.attempts = 0
+
+    def tearDown(self):
+        for j in self.sched.getJobs():
+            j.cancel()
+
+    def flaky(self, failures):
+        self.attempts += 1
+        if self.attempts <= failures:
+            raise IOError('backend unavailable')
+
+    def test_retry_until_success(self):
+        j = self.sched.addJob(60, self.flaky, 2)
+        j.retry = RetryPolicy(max_attempts=3, backoff=1, jitter=0)
+        self.clock.advance(0.1)
+        self.assertEquals(self.sched.running, 1)
+        self.clock.advance(1)
+        self.clock.advance(2)
+        self.assertEquals(self.attempts, 3)
+        self.assertEquals(self.sched.running, 0)
+        self.assertEquals([r[3] for r in j.history.getRecords()],
+                          [OUTCOME_SUCCESS, OUTCOME_FAILURE, OUTCOME_FAILURE])
+        self.assertEquals(j._timer.getTime(), 60.1)
+
+    def test_retry_on(self):
+        j = self.sched.addJob(60, self.flaky, 1)
+        j.retry = RetryPolicy(backoff=1, jitter=0, retry_on=(KeyError,))
+        self.clock.advance(0.1)
+        self.flushLoggedErrors(IOError)
+        self.assertEquals(self.sched.running, 0)
+        self.assertEquals(self.attempts, 1)
+
+    def test_no_overlap_with_next_run(self):
+        j = self.sched.addJob(3, self.flaky, 1)
+        j.retry = RetryPolicy(backoff=5, jitter=0)
+        self.clock.advance(0.1)
+        self.flushLoggedErrors(IOError)
+        self.assertEquals(self.sched.running, 0)
+        self.assertTrue(j._timer.active())
+
+    def test_retry_budget(self):
+        self.sched.retry_budget = TokenBucket(0.01, 1, 0)
+        self.sched.retry_budget.consume(0)
+        j = self.sched.addJob(60, self.flaky, 1)
+        j.retry = RetryPolicy(backoff=1, jitter=0)
+        self.clock.advance(0.1)
+        self.flushLoggedErrors(IOError)
+        self.assertEquals(self.sched.running, 0)
+
+    def test_cancel_pending_retry(self):
+        j = self.sched.addJob(60, self.flaky, 5)
+        j.retry = RetryPolicy(backoff=1, jitter=0)
+        self.clock.advance(0.1)
+        self.sched.removeJob(j.job_id)
+        self.flushLoggedErrors(IOError)
+        self.assertEquals(self.sched.running, 0)
+        self.clock.advance(10)
+        self.assertEquals(self.attempts, 1)
+        self.assertEquals(len(self.sched.timers), 0)
+
+    def test_retry_priority(self):
+        order = []
+        def urgent():
+            order.append('urgent')
+            self.flaky(1)
+        j = self.sched.addJob(60, urgent)
+        j.priority = 10
+        j.retry = RetryPolicy(backoff=1, jitter=0)
+        self.clock.advance(0.1)
+        self.sched.addJob(0.5, order.append, 'bulk')
+        # The bulk run is due first, the retry wins the pass.
+        self.clock.advance(2)
+        self.assertEquals(order, ['urgent', 'urgent', 'bulk'])
@@ -6,11 +6,13 @@ from datetime import datetime
 
 from twisted.trial.unittest import TestCase
 from twisted.internet import defer
+from twisted.internet.task import Clock
 from twisted.internet.base import DelayedCall
 from twisted.internet.error import AlreadyCalled, AlreadyCancelled
 
 from txcron.scheduler import Scheduler, SchedulerError
 from txcron.jobs import CronJob, IntervalJob, DateJob
+from txcron.history import OUTCOME_SUCCESS, OUTCOME_FAILURE
 
 def t_func(*args, **kwargs):
     print("Test Function:\n%s\n%s" % (args, kwargs))
@@ -76,3 +78,47 @@ class SchedulerTestCase(TestCase):
         self.assertEquals(j1, self.sched.getJob(j1.job_id))
         self.assertEquals(j2, self.sched.getJob(j2.job_id))
         self.assertEquals(j3, self.sched.getJob(j3.job_id))
+
+    def test_injected_clock(self):
+        clock = Clock()
+        clock.advance(1000)
+        sched = Scheduler(clock=clock)
+        calls = []
+        j = sched.addJob(60, calls.append, 'x')
+        self.assertEquals(sched.now(), datetime.fromtimestamp(1000))
+        clock.advance(0.1)
+        clock.advance(60)
+        self.assertEquals(calls, ['x', 'x'])
+        self.assertEquals(sched.executions, 2)
+        j.cancel()
+
+    def test_recent_failures(self):
+        clock = Clock()
+        sched = Scheduler(clock=clock)
+        ok = sched.addJob(60, t_func)
+        bad = sched.addJob(60, lambda: 1 / 0)
+        clock.advance(0.1)
+        self.flushLoggedErrors(ZeroDivisionError)
+        self.assertEquals(len(ok.history), 1)
+        self.assertEquals(ok.history.getRecords()[0][3], OUTCOME_SUCCESS)
+        failures = sched.getRecentFailures()
+        self.assertEquals(len(failures), 1)
+        self.assertEquals(failures[0][0], bad.job_id)
+        self.assertEquals(failures[0][4], OUTCOME_FAILURE)
+        self.assertTrue(failures[0][5].startswith('ZeroDivisionError'))
+        ok.cancel()
+        bad.cancel()
+
+    def test_callbacks_per_job(self):
+        clock = Clock()
+        sched = Scheduler(clock=clock)
+        other = Scheduler(clock=clock)
+        calls = []
+        a = sched.addJob(60, lambda: 'a')
+        b = sched.addJob(60, lambda: 'b')
+        c = other.addJob(60, lambda: 'c')
+        a.addCallback(calls.append)
+        clock.advance(0.1)
+        self.assertEquals(calls, ['a'])
+        for j in (a, b, c):
+            j.cancel()
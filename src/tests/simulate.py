@@ -0,0 +1,47 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.getcwd()))
+from datetime import datetime
+
+from twisted.trial.unittest import TestCase
+
+from txcron.simulate import Simulator
+
+class SimulatorTestCase(TestCase):
+
+    def setUp(self):
+        self.sim = Simulator(datetime(2010, 1, 4))
+
+    def tearDown(self):
+        pass
+
+    def test_interval_executions_per_tick(self):
+        self.sim.scheduler.addJob(60, lambda: None)
+        report = self.sim.run(3600, tick=600)
+        self.assertEquals(len(report.executions), 6)
+        self.assertEquals(report.executions[1:], [10] * 5)
+        self.assertEquals(report.peak_concurrency, 1)
+
+    def test_cron_week(self):
+        self.sim.scheduler.addJob('0 * * * *', lambda: None)
+        report = self.sim.run(7 * 24 * 3600, tick=24 * 3600)
+        self.assertEquals(report.executions, [24] * 7)
+        self.assertEquals(report.getTotalExecutions(), 7 * 24)
+
+    def test_peak_concurrency(self):
+        for i in range(5):
+            self.sim.scheduler.addJob(300, self.sim.work, 120)
+        report = self.sim.run(900, tick=300)
+        self.assertEquals(report.peak_concurrency, 5)
+
+    def test_dry_run(self):
+        sim = Simulator(datetime(2010, 1, 4), dry_run=True)
+        calls = []
+        job = sim.scheduler.addJob('0 * * * *', calls.append, 'x')
+        after = sim.scheduler.addDependentJob([job], calls.append, 'y')
+        report = sim.run(24 * 3600, tick=3600)
+        self.assertEquals(report.executions, [2] * 24)
+        self.assertEquals(calls, [])
+        self.assertEquals(job.times_executed, 24)
+        self.assertEquals(after.times_executed, 24)
+        self.assertEquals(report.peak_concurrency, 0)
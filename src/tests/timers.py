@@ -0,0 +1,67 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.getcwd()))
+
+from twisted.trial.unittest import TestCase
+from twisted.internet.task import Clock
+from twisted.internet.error import AlreadyCalled, AlreadyCancelled
+
+from txcron.timers import TimerQueue
+
+class TimerQueueTestCase(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.timers = TimerQueue(self.clock)
+        self.fired = []
+
+    def tearDown(self):
+        pass
+
+    def test_single_delayed_call(self):
+        for delay in (30, 10, 20):
+            self.timers.callLater(delay, self.fired.append, delay)
+        self.assertEquals(len(self.clock.getDelayedCalls()), 1)
+        self.clock.advance(15)
+        self.assertEquals(self.fired, [10])
+        self.clock.advance(15)
+        self.assertEquals(self.fired, [10, 20, 30])
+        self.assertEquals(self.clock.getDelayedCalls(), [])
+
+    def test_cancel(self):
+        t = self.timers.callLater(10, self.fired.append, 1)
+        t.cancel()
+        self.assertFalse(t.active())
+        self.assertRaises(AlreadyCancelled, t.cancel)
+        self.clock.advance(10)
+        self.assertEquals(self.fired, [])
+        self.assertEquals(len(self.timers), 0)
+
+    def test_reset(self):
+        t = self.timers.callLater(10, self.fired.append, 1)
+        self.clock.advance(5)
+        t.reset(10)
+        self.assertEquals(t.getTime(), 15)
+        self.clock.advance(5)
+        self.assertEquals(self.fired, [])
+        self.clock.advance(5)
+        self.assertEquals(self.fired, [1])
+        self.assertRaises(AlreadyCalled, t.reset, 1)
+
+    def test_zero_delay_waits_for_next_pass(self):
+        def again():
+            self.fired.append(self.clock.seconds())
+            self.timers.callLater(0, self.fired.append, 'next')
+            self.fired.append('after')
+        self.timers.callLater(1, again)
+        self.clock.advance(1)
+        self.assertEquals(self.fired, [1, 'after', 'next'])
+
+    def test_priority_within_pass(self):
+        for priority in (0, 5, -1, 5):
+            t = self.timers.callLater(10, self.fired.append, priority)
+            t.priority = priority
+        self.timers.callLater(5, self.fired.append, 'early')
+        # Everything is due in one pass: priority first, then due time.
+        self.clock.advance(10)
+        self.assertEquals(self.fired, [5, 5, 'early', 0, -1])
@@ -0,0 +1,154 @@
+import os
+import sys
+sys.path.append(os.path.dirname(os.getcwd()))
+import json
+
+from twisted.trial.unittest import TestCase
+from twisted.internet.task import Clock
+from twisted.web.resource import getChildForRequest
+from twisted.web.server import NOT_DONE_YET
+from twisted.web.test.requesthelper import DummyRequest
+
+from txcron.scheduler import Scheduler
+from txcron import web
+from txcron.web import AdminResource
+
+def t_func():
+    pass
+
+class AdminResourceTestCase(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.sched = Scheduler(clock=self.clock)
+        self.root = AdminResource(self.sched)
+
+    def tearDown(self):
+        for j in self.sched.getJobs():
+            j.cancel()
+
+    def render(self, path, method='GET', **args):
+        request = DummyRequest(path and path.split('/') or [])
+        request.method = method
+        # DummyRequest only drives pull producers.
+        request.producers = []
+        request.registerProducer = lambda p, s: request.producers.append(p)
+        request.unregisterProducer = lambda: request.producers.pop()
+        for k, v in args.items():
+            if not isinstance(v, list):
+                v = [str(v)]
+            request.args[k] = v
+        child = getChildForRequest(self.root, request)
+        result = child.render(request)
+        if result is not NOT_DONE_YET:
+            request.write(result)
+            request.finish()
+        return request
+
+    def test_summary(self):
+        self.sched.addJob(60, t_func)
+        request = self.render('')
+        self.assertEquals(json.loads(''.join(request.written))['jobs'], 1)
+
+    def page(self, **args):
+        return json.loads(''.join(self.render('jobs', **args).written))
+
+    def test_paged_listing(self):
+        jobs = [self.sched.addJob(60, t_func) for i in range(10)]
+        page = self.page(limit=4)
+        self.assertEquals([j['job_id'] for j in page['jobs']],
+                          [j.job_id for j in jobs[:4]])
+
+        # Jobs added or removed between requests don't shift the pages.
+        self.sched.removeJob(jobs[0].job_id)
+        self.sched.removeJob(jobs[5].job_id)
+        new = self.sched.addJob(60, t_func)
+        page = self.page(after=page['next'], limit=4)
+        self.assertEquals([j['job_id'] for j in page['jobs']],
+                          [j.job_id for j in jobs[4:5] + jobs[6:9]])
+        page = self.page(after=page['next'], limit=4)
+        self.assertEquals([j['job_id'] for j in page['jobs']],
+                          [jobs[9].job_id, new.job_id])
+        self.assertEquals(page['next'], None)
+
+    def test_filtered_page_scan_limit(self):
+        self.patch(web, 'MAX_PAGE_SCAN', 5)
+        jobs = [self.sched.addJob(60, t_func) for i in range(12)]
+        jobs[11].tag = 'rare'
+        page = self.page(tag='rare', limit=1)
+        self.assertEquals(page['jobs'], [])
+        self.assertEquals(page['next'], jobs[4].job_id)
+        page = self.page(tag='rare', limit=1, after=page['next'])
+        page = self.page(tag='rare', limit=1, after=page['next'])
+        self.assertEquals([j['job_id'] for j in page['jobs']],
+                          [jobs[11].job_id])
+        self.assertEquals(page['next'], None)
+
+    def test_streamed_listing(self):
+        for i in range(450):
+            self.sched.addJob('*/5', t_func)
+        request = self.render('jobs', stream=1)
+        self.assertEquals(request.finished, 0)
+        while not request.finished:
+            self.clock.advance(0)
+        lines = ''.join(request.written).splitlines()
+        self.assertEquals(len(lines), 450)
+        self.assertEquals(json.loads(lines[0])['type'], 'CronJob')
+        self.assertTrue(len(request.written) >= 3)
+        self.assertEquals(request.producers, [])
+
+    def test_streamed_listing_paused(self):
+        for i in range(450):
+            self.sched.addJob('*/5', t_func)
+        request = self.render('jobs', stream=1)
+        producer = request.producers[0]
+        producer.pauseProducing()
+        for i in range(5):
+            self.clock.advance(0)
+        self.assertEquals(request.written, [])
+
+        producer.resumeProducing()
+        while not request.finished:
+            self.clock.advance(0)
+        self.assertEquals(len(''.join(request.written).splitlines()), 450)
+
+    def test_remove_running_job(self):
+        from twisted.internet import defer
+        running = defer.Deferred()
+        cron = self.sched.addJob('* * * * *', lambda: running)
+        interval = self.sched.addJob(60, lambda: running)
+        self.clock.advance(60)
+        self.render('jobs/remove', 'POST',
+                    id=[str(cron.job_id), str(interval.job_id)])
+        running.callback(None)
+        self.assertEquals(self.sched.getJobCount(), 0)
+
+    def test_job_stats(self):
+        j = self.sched.addJob(60, t_func)
+        self.clock.advance(0.1)
+        request = self.render('jobs/%d' % (j.job_id,))
+        stats = json.loads(''.join(request.written))
+        self.assertEquals(stats['times_executed'], 1)
+        self.assertEquals(stats['history'][0]['outcome'], 'success')
+        self.assertEquals(self.render('jobs/999').responseCode, 404)
+
+    def test_upcoming(self):
+        j1 = self.sched.addJob(300, t_func)
+        j2 = self.sched.addJob(100, t_func)
+        j3 = self.sched.addJob(200, t_func)
+        self.clock.advance(0.1)
+        request = self.render('upcoming', limit=2)
+        jobs = json.loads(''.join(request.written))['jobs']
+        self.assertEquals([j['job_id'] for j in jobs], [j2.job_id, j3.job_id])
+
+    def test_bulk_actions(self):
+        j1 = self.sched.addJob(60, t_func)
+        j2 = self.sched.addJob(60, t_func)
+        request = self.render('jobs/pause', 'POST',
+                              id=[str(j1.job_id), str(j2.job_id), '99'])
+        result = json.loads(''.join(request.written))
+        self.assertEquals(result['done'], [j1.job_id, j2.job_id])
+        self.assertEquals(result['missing'], [99])
+        self.assertEquals(len(self.sched.getPausedJobs()), 2)
+        self.render('jobs/remove', 'POST', id=[str(j1.job_id)])
+        self.assertEquals(self.sched.getJobCount(), 1)
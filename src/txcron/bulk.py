@@ -0,0 +1,218 @@
+import time
+import heapq
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+
+from txcron.jobs import DateJob
+from txcron.timers import EPSILON
+
+# Width in seconds of the time buckets entries are grouped in.
+DEFAULT_BUCKET_WIDTH = 60.0
+
+class _Bucket(object):
+    """Parallel arrays of the entries due within one bucket width.
+       They are sorted by fire time when the bucket starts firing and
+       kept sorted after that.  Until then only the earliest fire time
+       is tracked, so adding entries is O(1).
+    """
+
+    def __init__(self):
+        self.times = array('d')
+        self.funcs = array('l')
+        self.ids = array('l')
+        self.pos = 0
+        self.sorted = True
+        self.first = None
+
+    def __len__(self):
+        return len(self.times) - self.pos
+
+    def getFirstTime(self):
+        if self.pos:
+            return self.times[self.pos]
+        return self.first
+
+    def append(self, fire_time, func_id, entry_id):
+        if self.first is None or fire_time < self.first:
+            self.first = fire_time
+        if self.sorted and self.times and fire_time < self.times[-1]:
+            if self.pos:
+                # Already being consumed: keep the tail in order.
+                i = bisect_right(self.times, fire_time, self.pos)
+                self.times.insert(i, fire_time)
+                self.funcs.insert(i, func_id)
+                self.ids.insert(i, entry_id)
+                return
+            self.sorted = False
+
+        self.times.append(fire_time)
+        self.funcs.append(func_id)
+        self.ids.append(entry_id)
+
+    def sort(self):
+        if self.sorted:
+            return
+        times = self.times
+        order = sorted(xrange(len(times)), key=times.__getitem__)
+        self.times = array('d', [times[i] for i in order])
+        self.funcs = array('l', [self.funcs[i] for i in order])
+        self.ids = array('l', [self.ids[i] for i in order])
+        self.sorted = True
+
+class OneShotStore(object):
+    """Compact storage for large numbers of one-shot jobs.
+
+       Instead of a DateJob, a Deferred and a timer per entry, every
+       entry is a (fire_time, callable_id, entry_id) row in the arrays
+       of a time bucket; arguments, if any, are kept in a dict keyed by
+       entry id.  The store needs a single timer for all its entries.
+       A DateJob is only created for an entry when it is due, and it
+       is dispatched and removed like any other DateJob.
+
+       Callables are interned and kept for the lifetime of the store,
+       so pass a few module level functions with per-entry arguments
+       rather than one closure per entry.  The store also keeps one
+       byte per entry ever added, marking whether it is still pending.
+
+       >>> entry_id = sched.oneshots.add(datetime(2010, 1, 4, 9), remind, 42)
+    """
+
+    def __init__(self, scheduler, bucket_width=DEFAULT_BUCKET_WIDTH):
+        self.scheduler = scheduler
+        self.bucket_width = float(bucket_width)
+
+        self._buckets = {}
+        self._keys = []
+        self._callables = []
+        self._callable_ids = {}
+        self._payloads = {}
+        # Per entry id: 0 while pending, 1 once fired or cancelled.
+        self._done = bytearray()
+        self._next_id = 0
+        self._count = 0
+        self._timer = None
+
+    def __len__(self):
+        return self._count
+
+    def _internCallable(self, func):
+        # Keyed by id() since bound methods of unhashable objects can't
+        # be dict keys; self._callables keeps the id from being reused.
+        try:
+            return self._callable_ids[id(func)]
+        except KeyError:
+            func_id = len(self._callables)
+            self._callables.append(func)
+            self._callable_ids[id(func)] = func_id
+            return func_id
+
+    def _insert(self, fire_time, func, args, kwargs):
+        if not callable(func):
+            raise ValueError("'func' must be callable")
+        if isinstance(fire_time, datetime):
+            fire_time = time.mktime(fire_time.timetuple()) \
+                        + fire_time.microsecond / 1e6
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._done.append(0)
+        if args or kwargs:
+            self._payloads[entry_id] = (args, kwargs or None)
+
+        key = int(fire_time // self.bucket_width)
+        try:
+            bucket = self._buckets[key]
+        except KeyError:
+            bucket = self._buckets[key] = _Bucket()
+            heapq.heappush(self._keys, key)
+
+        bucket.append(fire_time, self._internCallable(func), entry_id)
+        self._count += 1
+        return entry_id
+
+    def _getFirstBucket(self):
+        while self._keys:
+            key = self._keys[0]
+            bucket = self._buckets[key]
+            if len(bucket):
+                return bucket
+            heapq.heappop(self._keys)
+            del self._buckets[key]
+        return None
+
+    def _arm(self):
+        bucket = self._getFirstBucket()
+        if bucket is None:
+            if self._timer is not None and self._timer.active():
+                self._timer.cancel()
+            self._timer = None
+            return
+
+        when = bucket.getFirstTime()
+        delay = max(0, when - self.scheduler.seconds())
+        if self._timer is not None and self._timer.active():
+            if self._timer.getTime() != when:
+                self._timer.reset(delay)
+        else:
+            self._timer = self.scheduler.timers.callLater(delay, self._fire)
+
+    def _fire(self):
+        deadline = self.scheduler.seconds() + EPSILON
+        due = []
+        bucket = self._getFirstBucket()
+        while bucket is not None and bucket.getFirstTime() <= deadline:
+            bucket.sort()
+            i = bucket.pos
+            bucket.pos += 1
+            entry_id = bucket.ids[i]
+            if not self._done[entry_id]:
+                self._done[entry_id] = 1
+                self._count -= 1
+                due.append((bucket.times[i], bucket.funcs[i], entry_id))
+
+            if not len(bucket):
+                bucket = self._getFirstBucket()
+
+        for fire_time, func_id, entry_id in due:
+            args, kwargs = self._payloads.pop(entry_id, ((), None))
+            self.scheduler._dispatchOneShot(fire_time,
+                                            self._callables[func_id],
+                                            args, kwargs or {})
+        self._arm()
+
+    # Public API
+
+    def add(self, date_time, func, *args, **kwargs):
+        """Adds a one-shot entry firing at date_time, a datetime or a
+           timestamp.  Returns the entry id.  Adding is O(1) unless the
+           entry lands in a bucket that is already firing, which costs
+           an insert into that bucket's arrays.
+        """
+        entry_id = self._insert(date_time, func, args, kwargs)
+        self._arm()
+        return entry_id
+
+    def addMany(self, entries):
+        """Adds (date_time, func, args) tuples in bulk.  Returns the
+           entry ids.
+        """
+        ids = [self._insert(date_time, func, args, {})
+               for date_time, func, args in entries]
+        self._arm()
+        return ids
+
+    def cancel(self, entry_id):
+        """Cancels an entry that hasn't fired yet.  Returns False if
+           the entry already fired or was cancelled.
+        """
+        if entry_id < 0 or entry_id >= self._next_id:
+            raise KeyError(entry_id)
+        if self._done[entry_id]:
+            return False
+
+        # The row stays in its bucket and is skipped when it is due.
+        self._done[entry_id] = 1
+        self._count -= 1
+        self._payloads.pop(entry_id, None)
+        return True
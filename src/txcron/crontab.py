@@ -0,0 +1,185 @@
+import os
+import re
+
+from twisted.python import log
+from twisted.internet import utils
+
+from txcron.scheduler import SchedulerError
+
+# Seconds between checks of the crontab file for changes.
+DEFAULT_INTERVAL = 10
+
+ENVIRONMENT_RE = re.compile('^[A-Za-z_][A-Za-z0-9_]*\s*=')
+
+class CrontabError(Exception): pass
+
+def parseCrontabLine(line):
+    """Splits a crontab line into (schedule, command).  Returns None
+       for blank lines, comments and environment settings.
+
+       >>> parseCrontabLine('*/5 * * * * /usr/bin/cleanup --all')
+       ... ('*/5 * * * *', '/usr/bin/cleanup --all')
+       >>> parseCrontabLine('@hourly /usr/bin/rotate')
+       ... ('@hourly', '/usr/bin/rotate')
+    """
+    line = line.strip()
+    if not line or line.startswith('#') or ENVIRONMENT_RE.match(line):
+        return None
+
+    if line.startswith('@'):
+        fields = line.split(None, 1)
+        if len(fields) != 2:
+            raise CrontabError('Missing command: %s' % (line,))
+        return (fields[0], fields[1])
+
+    fields = line.split(None, 5)
+    if len(fields) != 6:
+        raise CrontabError('Expected 5 fields and a command: %s' % (line,))
+    return (' '.join(fields[:5]), fields[5])
+
+def shellCommand(command):
+    """Default resolver: runs command with /bin/sh like cron does."""
+    def run():
+        return utils.getProcessValue('/bin/sh', ('-c', command),
+                                     env=os.environ)
+    return run
+
+class CrontabLoader(object):
+    """Keeps the jobs of a Scheduler in sync with a crontab file.
+
+       Every command is turned into a job function by resolve(command),
+       which defaults to running it through the shell.  Entries are
+       identified by their command (and the occurrence of that command
+       in the file), so on reload:
+
+         - unchanged entries keep their job and timer
+         - entries with a new schedule go through job.reschedule()
+         - entries no longer in the file go through removeJob()
+
+       Only entries that changed are parsed by CronParser or touch the
+       scheduler.  Lines that fail to parse are logged and skipped.
+
+       >>> loader = CrontabLoader(sched, '/etc/txcron.tab')
+       >>> loader.start()
+    """
+
+    _timer = None
+    _stat = None
+
+    def __init__(self, scheduler, path, resolve=shellCommand,
+                 interval=DEFAULT_INTERVAL):
+        self.scheduler = scheduler
+        self.path = path
+        self.resolve = resolve
+        self.interval = interval
+
+        # (command, occurrence) -> (schedule, job)
+        self.entries = {}
+
+    def _readEntries(self):
+        entries = {}
+        occurrences = {}
+        f = open(self.path)
+        try:
+            for lineno, line in enumerate(f):
+                try:
+                    parsed = parseCrontabLine(line)
+                except CrontabError, e:
+                    log.msg('%s:%d: %s' % (self.path, lineno + 1, e))
+                    continue
+                if parsed is None:
+                    continue
+
+                schedule, command = parsed
+                n = occurrences.get(command, 0)
+                occurrences[command] = n + 1
+                entries[(command, n)] = schedule
+        finally:
+            f.close()
+        return entries
+
+    def _apply(self, entries):
+        added = changed = removed = 0
+        sched = self.scheduler
+
+        for key, schedule in entries.iteritems():
+            current = self.entries.get(key)
+            if current is not None and current[0] == schedule:
+                continue
+
+            try:
+                if current is None:
+                    job = sched.addJob(schedule, self.resolve(key[0]))
+                    added += 1
+                else:
+                    job = current[1]
+                    job.reschedule(schedule)
+                    changed += 1
+            except Exception, e:
+                # Whatever a bad line raises, the rest of the file still
+                # has to be applied.
+                log.msg('%s: bad schedule %r for %r: %s' %
+                        (self.path, schedule, key[0], e))
+                continue
+            self.entries[key] = (schedule, job)
+
+        for key in [k for k in self.entries if k not in entries]:
+            schedule, job = self.entries.pop(key)
+            try:
+                sched.removeJob(job.job_id)
+            except SchedulerError:
+                # Already removed through the scheduler.
+                continue
+            removed += 1
+
+        return (added, changed, removed)
+
+    def _poll(self):
+        try:
+            self.reload()
+        except (IOError, OSError), e:
+            log.msg('Could not read %s: %s' % (self.path, e))
+        except:
+            log.err()
+        finally:
+            self._timer = self.scheduler.timers.callLater(self.interval,
+                                                          self._poll)
+
+    # Public API
+
+    def load(self):
+        """Reads the file and applies the differences to the scheduler.
+           Returns the number of (added, changed, removed) entries.
+        """
+        st = os.stat(self.path)
+        self._stat = (st.st_mtime, st.st_size, st.st_ino)
+        return self._apply(self._readEntries())
+
+    def reload(self):
+        """Like load(), but only if the file changed since the last
+           load.  Returns None if it didn't.
+        """
+        st = os.stat(self.path)
+        if (st.st_mtime, st.st_size, st.st_ino) == self._stat:
+            return None
+        return self.load()
+
+    def start(self):
+        """Loads the file and starts watching it for changes."""
+        try:
+            self.load()
+        finally:
+            self._timer = self.scheduler.timers.callLater(self.interval,
+                                                          self._poll)
+
+    def stop(self):
+        if self._timer is not None and self._timer.active():
+            self._timer.cancel()
+        self._timer = None
+
+    def getJob(self, command, occurrence=0):
+        """Returns the job of command or None."""
+        entry = self.entries.get((command, occurrence))
+        if entry is None:
+            return None
+        return entry[1]
@@ -57,7 +57,7 @@ SHORTCUTS = {
 'hourly':[0, '*', '*', '*', '*']
 }
 
-SHORTCUT_RE = re.compile('^\@(?P<keyword>[a-z])$')
+SHORTCUT_RE = re.compile('^\@(?P<keyword>[a-z]+)$')
 CRON_FIELD_RE = re.compile('^((?P<star>\*)|(?P<begin>(\d{1,2}|[a-zA-Z]+))'\
                              '(?:-(?P<end>(\d{1,2}|[a-zA-Z]+)))?)'\
                              '(?:/(?P<step>\d{1,2}))?$')
@@ -123,7 +123,7 @@ class CronParser(object):
         if not m is None:
             # Found a shortcut
             try:
-                fields = SHORTCUTS.get(m.group('keyword'))
+                fields = map(str, SHORTCUTS[m.group('keyword')])
             except KeyError:
                 raise ValueError('Unknown shortcut value: %s' % (cron_string,))
         else:
@@ -164,15 +164,19 @@ class CronParser(object):
         """Convert an alpha field to it's integer counterpart.
            Only the dow and month fields are allowed to contain words.
         """
+        # Names may be abbreviated down to their first three letters.
+        alpha = alpha.lower()
         intfield = None
-        if high == MAX_DOW:
-            for k, v in WEEKDAYS.iteritems():
-                if v.tolower().startswith(alpha.tolower(), 0, 2):
+        if len(alpha) < 3:
+            pass
+        elif high == MAX_DOW:
+            for k, v in sorted(WEEKDAYS.iteritems()):
+                if v.startswith(alpha):
                     intfield = int(k)
                     break
         elif high == MAX_MONTH:
-            for k, v in MONTHS.iteritems():
-                if v.tolower().startswith(alpha.tolower(), 0, 2):
+            for k, v in sorted(MONTHS.iteritems()):
+                if v.startswith(alpha):
                     intfield = int(k)
                     break
         else:
@@ -207,7 +211,7 @@ class CronParser(object):
                 step = 1
 
             if not star is None:
-                return [val for val in (low, high+1, step)]
+                return [val for val in xrange(low, high+1, step)]
             if not begin is None:
                 try:
                     begin = int(begin)
@@ -222,16 +226,18 @@ class CronParser(object):
                     raise CronParseError('Cannot supply a step with a \
                                           single specifier: %s' % (field,))
 
+                if begin < low or begin > high:
+                    raise CronOutOfBoundsError(field)
                 return [begin]
             else:
                 try:
                     end = int(end)
                 except ValueError:
-                    end = self._convertAlpha(end)
+                    end = self._convertAlpha(end, high)
 
-                if begin < high and begin >= low and end <= high and end > low:
+                if low <= begin <= end <= high:
                     return [val for val in xrange(begin, end+1, step)]
-                raise CronOutOfBoundsError
+                raise CronOutOfBoundsError(field)
         else:
             raise CronParseError('Failed to parse cron entry: %s' % (field,))
 
@@ -0,0 +1,105 @@
+from array import array
+
+OUTCOME_NONE = 0
+OUTCOME_SUCCESS = 1
+OUTCOME_FAILURE = 2
+OUTCOME_TIMEOUT = 3
+
+OUTCOMES = {
+OUTCOME_NONE:'none',
+OUTCOME_SUCCESS:'success',
+OUTCOME_FAILURE:'failure',
+OUTCOME_TIMEOUT:'timeout'
+}
+
+DEFAULT_SIZE = 16
+
+# Error messages are cut down to this many characters.
+ERROR_LENGTH = 120
+
+class ExecutionHistory(object):
+    """Fixed size ring buffer of the most recent executions of a job.
+
+       Every column is allocated up front, so recording an execution
+       overwrites the oldest slot instead of growing anything.
+       Records are returned as (scheduled, start, end, outcome, error)
+       tuples, newest first.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+
+        self.size = size
+        self.count = 0
+        self._next = 0
+        self._scheduled = array('d', [0.0]) * size
+        self._start = array('d', [0.0]) * size
+        self._end = array('d', [0.0]) * size
+        self._outcome = array('b', [OUTCOME_NONE]) * size
+        self._error = [None] * size
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def _write(self, scheduled, start, end, outcome, error):
+        i = self._next
+        self._scheduled[i] = scheduled
+        self._start[i] = start
+        self._end[i] = end
+        self._outcome[i] = outcome
+        if error is not None:
+            error = error[:ERROR_LENGTH]
+        self._error[i] = error
+        self._next = (i + 1) % self.size
+        self.count += 1
+        return i
+
+    def _read(self, i):
+        return (self._scheduled[i], self._start[i], self._end[i],
+                self._outcome[i], self._error[i])
+
+    def _indexes(self):
+        """Yields the slot indexes from newest to oldest."""
+        i = self._next
+        for n in xrange(len(self)):
+            i = (i - 1) % self.size
+            yield i
+
+    # Public API
+
+    def record(self, scheduled, start, end, outcome, error=None):
+        self._write(scheduled, start, end, outcome, error)
+
+    def getRecords(self, limit=None):
+        records = []
+        for i in self._indexes():
+            if limit is not None and len(records) >= limit:
+                break
+            records.append(self._read(i))
+        return records
+
+    def getFailures(self, limit=None):
+        records = []
+        for i in self._indexes():
+            if limit is not None and len(records) >= limit:
+                break
+            if self._outcome[i] not in (OUTCOME_NONE, OUTCOME_SUCCESS):
+                records.append(self._read(i))
+        return records
+
+class FailureLog(ExecutionHistory):
+    """Scheduler wide ring buffer of failed executions.  Records are
+       (job_id, scheduled, start, end, outcome, error) tuples.
+    """
+
+    def __init__(self, size=1024):
+        ExecutionHistory.__init__(self, size)
+        self._job_id = array('l', [0]) * size
+
+    def _read(self, i):
+        return (self._job_id[i],) + ExecutionHistory._read(self, i)
+
+    def record(self, job_id, scheduled, start, end, outcome, error=None):
+        i = self._write(scheduled, start, end, outcome, error)
+        self._job_id[i] = job_id
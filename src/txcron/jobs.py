@@ -2,24 +2,43 @@ import time
 import copy
 from datetime import datetime
 
-from twisted.internet import reactor, defer
+from twisted.internet import defer
+from twisted.python import failure
 from twisted.internet.error import AlreadyCalled, AlreadyCancelled
 from zope.interface import implements
 
 from txcron.interfaces import IJob
 from txcron.cronutil import CronParser
+from txcron.history import OUTCOME_SUCCESS, OUTCOME_FAILURE, OUTCOME_TIMEOUT
+from txcron.journal import EVENT_FIRE, EVENT_CANCEL, EVENT_RESCHEDULE
+
+# When a DependentJob runs: after all upstreams succeeded in the same
+# cycle, or after they all completed regardless of the outcome.
+TRIGGER_SUCCESS = 'success'
+TRIGGER_ALWAYS = 'always'
 
 class AbstractBaseJob(object):
     _paused = False
     _cancelled = False
     _timer = None
-    _user_callbacks = []
-    _user_errbacks = []
+    # Replaced by per-job lists in __init__
+    _user_callbacks = ()
+    _user_errbacks = ()
     func = None
+    tag = None
+    batch_key = None
+    _priority = 0
+    timeout = None
+    retry = None
     job_id = 0
     next_exec_time = 0
     last_exec_time = 0
     times_executed = 0
+    misfires = 0
+    history = None
+    _pending_retry = None
+    _queued = False
+    _due_time = None
     args = []
     kwargs = {}
 
@@ -29,9 +48,118 @@ class AbstractBaseJob(object):
     def _post_exec_hook(self, result):
         return result
 
+    def _misfire(self):
+        """Called instead of execute() when a due run is dropped."""
+        self._post_exec_hook(None)
+
+    def _getNextRunTime(self):
+        """Returns when the next regular run is due if the job were
+           rescheduled now, or None if there is no next run.
+        """
+        return None
+
+    def _run(self, scheduled, attempt=1, result_df=None):
+        """Calls self.func once and returns its Deferred, with the
+           timeout, history and retry handling attached.  If result_df
+           is given, it stands in for the call, e.g. for a batched run.
+        """
+        started = self.manager.seconds()
+        if result_df is None:
+            main_df = defer.maybeDeferred(self.func, *self.args, **self.kwargs)
+        else:
+            main_df = result_df
+
+        timer = None
+        timeout = self.getTimeout()
+        if timeout and not main_df.called:
+            timer = self.manager.timers.callLater(timeout,
+                                                  self._timeoutExecution,
+                                                  main_df)
+
+        main_df.addBoth(self._recordExecution, scheduled, started, timer)
+        if self.retry is not None:
+            main_df.addErrback(self._retryExecution, scheduled, attempt)
+        return main_df
+
+    def _retryExecution(self, reason, scheduled, attempt):
+        if not self.retry.shouldRetry(reason, attempt):
+            return reason
+
+        # A retry must be under way before the next regular run is due,
+        # and the scheduler wide retry budget damps retry storms.
+        now = self.manager.seconds()
+        delay = self.retry.getDelay(attempt)
+        next_run = self._getNextRunTime()
+        if next_run is not None and now + delay >= next_run:
+            return reason
+
+        budget = self.manager.retry_budget
+        if budget is not None and not budget.consume(now):
+            return reason
+
+        # The rest of the execution chain waits on retry_df.
+        retry_df = defer.Deferred()
+        timer = self.manager.timers.callLater(delay, self._retryRun,
+                                              retry_df, scheduled, attempt + 1)
+        timer.priority = self.priority
+        self._pending_retry = (timer, retry_df, reason)
+        return retry_df
+
+    def _retryRun(self, retry_df, scheduled, attempt):
+        self._pending_retry = None
+        self._run(scheduled, attempt).chainDeferred(retry_df)
+
+    def _abortRetry(self):
+        if self._pending_retry is not None:
+            timer, retry_df, reason = self._pending_retry
+            self._pending_retry = None
+            timer.cancel()
+            retry_df.errback(reason)
+
+    def _notifyCompletion(self, result):
+        succeeded = not isinstance(result, failure.Failure)
+        self.manager._jobCompleted(self, succeeded)
+        return result
+
+    def _timeoutExecution(self, main_df):
+        # Cancelling fires main_df with a CancelledError, which runs the
+        # rest of the chain and reschedules the job.  Functions that hold
+        # on to a worker should give their Deferred a canceller that
+        # stops it.
+        main_df.cancel()
+
+    def _recordExecution(self, result, scheduled, started, timer=None):
+        if timer is not None and timer.active():
+            timer.cancel()
+
+        if timer is not None and timer.called \
+        and isinstance(result, failure.Failure) \
+        and result.check(defer.CancelledError):
+            outcome = OUTCOME_TIMEOUT
+            error = 'Timed out after %.1f seconds' % (self.getTimeout(),)
+        elif isinstance(result, failure.Failure):
+            outcome = OUTCOME_FAILURE
+            error = '%s: %s' % (result.type.__name__,
+                                result.getErrorMessage())
+        else:
+            outcome = OUTCOME_SUCCESS
+            error = None
+
+        self.manager._recordExecution(self, scheduled, started,
+                                      self.manager.seconds(), outcome, error)
+        return result
+
     def getNextExecutionDelay(self):
         raise NotImplementedError
 
+    def getTimeout(self):
+        """Returns the seconds a run may take before it is cancelled,
+           or None to let it run for as long as it takes.
+        """
+        if self.timeout is not None:
+            return self.timeout
+        return self.manager.default_timeout
+
     def addCallback(self, func, *args, **kwargs):
         """ Convenience method to add additional callbacks to the function
             to be executed by this scheduled job.
@@ -39,7 +167,7 @@ class AbstractBaseJob(object):
         if not callable(func):
             raise TypeError('%s must be callable' % (func,))
 
-        self._user_callbacks.append((func, *args, **kwargs,))
+        self._user_callbacks.append((func, args, kwargs,))
 
     def addErrback(self, func, *args, **kwargs):
         """ Convenience method to add additional errbacks to the function
@@ -48,11 +176,18 @@ class AbstractBaseJob(object):
         if not callable(func):
             raise TypeError('%s must be callable' % (func,))
 
-        self._user_errbacks.append((func, *args, **kwargs,))
+        self._user_errbacks.append((func, args, kwargs,))
 
-    def execute(self):
-        self.last_exec_time = reactor.seconds()
+    def execute(self, result_df=None):
+        self.last_exec_time = self.manager.seconds()
         self.times_executed = self.times_executed + 1
+        if self._timer is not None:
+            scheduled = self._timer.getTime()
+        elif self._due_time is not None:
+            scheduled = self._due_time
+        else:
+            scheduled = self.last_exec_time
+        self.manager._journalEvent(EVENT_FIRE, self.job_id, scheduled)
 
         # Here 3 Deferred() object callback chains are going to be chained 
         # together.  The first Deferred, main_df is triggered at the specified
@@ -67,7 +202,10 @@ class AbstractBaseJob(object):
         # main_df
         #  user_df
         #   post_df
-        main_df = defer.maybeDeferred(self.func, *self.args, **self.kwargs)
+        #
+        # If the job has a retry policy, main_df waits for the retries
+        # before the failure is passed on.
+        main_df = self._run(scheduled, result_df=result_df)
         user_df = defer.Deferred()
         for f in self._user_callbacks: 
             user_df.addCallback(f[0], *f[1], **f[2])
@@ -76,6 +214,7 @@ class AbstractBaseJob(object):
             user_df.addErrback(f[0], *f[1], **f[2])
 
         post_df = defer.Deferred()
+        post_df.addBoth(self._notifyCompletion)
         post_df.addBoth(self._post_exec_hook)
 
         main_df.chainDeferred(user_df)
@@ -89,22 +228,50 @@ class AbstractBaseJob(object):
         self.manager.scheduleJob(self.job_id)
 
     def cancel(self):
+        # Only journaled if a run was still to come.
+        pending = not self._cancelled and (self._paused
+                                           or self._pending_retry is not None
+                                           or (self._timer is not None
+                                               and self._timer.active()))
+
         self._cancelled = True
-        try:
-            self._timer.cancel()
-        except (AlreadyCalled, AlreadyCancelled):
-            pass
+        if self._timer is not None:
+            try:
+                self._timer.cancel()
+            except (AlreadyCalled, AlreadyCancelled):
+                pass
+        self._abortRetry()
+
+        if pending:
+            self.manager._journalEvent(EVENT_CANCEL, self.job_id)
 
     def pause(self):
         self._paused = True
-        try:
-            self._timer.cancel()
-        except (AlreadyCalled, AlreadyCancelled):
-            pass
+        if self._timer is not None:
+            try:
+                self._timer.cancel()
+            except (AlreadyCalled, AlreadyCancelled):
+                pass
+        self._abortRetry()
 
     def reschedule(self, schedule):
         raise NotImplementedError
 
+    def _getPriority(self):
+        return self._priority
+
+    def _setPriority(self, priority):
+        # A pending run picks up the new priority too.
+        self._priority = priority
+        if self._timer is not None:
+            self._timer.priority = priority
+        if self._pending_retry is not None:
+            self._pending_retry[0].priority = priority
+
+    priority = property(_getPriority, _setPriority, doc=
+        """Of two jobs due in the same pass of the timers, the one with
+           the higher priority is dispatched first.""")
+
 class CronJob(AbstractBaseJob):
 
     implements(IJob)
@@ -114,6 +281,8 @@ class CronJob(AbstractBaseJob):
 
     def __init__(self, job_id, manager, cron_string, func, *args, **kwargs):
         self.df = defer.Deferred()
+        self._user_callbacks = []
+        self._user_errbacks = []
         self.job_id = job_id
         self.manager = manager
         self.func = func
@@ -124,23 +293,27 @@ class CronJob(AbstractBaseJob):
 
     def getNextExecutionDelay(self):
         if not self.next_exec_time:
-            self.next_exec_time = self.schedule.getNextTimestamp(datetime.now())
+            self.next_exec_time = self.schedule.getNextTimestamp(self.manager.now())
 
-        delay = self.next_exec_time - reactor.seconds()
+        delay = self.next_exec_time - self.manager.seconds()
         if delay < 0:
             delay = 0.1
         return delay
 
+    def _getNextRunTime(self):
+        return self.schedule.getNextTimestamp(self.manager.now())
+
     def _post_exec_hook(self, result):
-        self.next_exec_time = self.schedule.getNextTimestamp(datetime.now())
-        self.manager.scheduleJob(self.job_id)
+        self.next_exec_time = self.schedule.getNextTimestamp(self.manager.now())
+        if not self._cancelled:
+            self.manager.scheduleJob(self.job_id)
         return result
 
     def reschedule(self, cron_string):
+        self.schedule = CronParser(cron_string)
         self.cron_string = cron_string
-        self.schedule = CronScheduler(cron_string)
-        self.next_exec_time = self.schedule.getNextTimestamp(datetime.now())
-        self._timer.reset(self.getNextExecutionDelay())
+        self.next_exec_time = self.schedule.getNextTimestamp(self.manager.now())
+        self.manager.scheduleJob(self.job_id)
 
 class DateJob(AbstractBaseJob):
 
@@ -150,6 +323,8 @@ class DateJob(AbstractBaseJob):
 
     def __init__(self, job_id, manager, date_time, func, *args, **kwargs):
         self.df = defer.Deferred()
+        self._user_callbacks = []
+        self._user_errbacks = []
         self.job_id = job_id
         self.manager = manager
         self.func = func
@@ -158,11 +333,12 @@ class DateJob(AbstractBaseJob):
         self.date_time = self.parseDateTime(date_time)
 
     def _post_exec_hook(self, result):
-        self.manager.removeJob(self.job_id)
+        if not self._cancelled:
+            self.manager.removeJob(self.job_id)
         return result
 
     def getNextExecutionDelay(self):
-        delay = time.mktime(self.date_time.timetuple()) - reactor.seconds()
+        delay = time.mktime(self.date_time.timetuple()) - self.manager.seconds()
         if delay < 0:
             delay = 0.1
 
@@ -177,6 +353,8 @@ class DateJob(AbstractBaseJob):
     def reschedule(self, date_time):
         self.date_time = self.parseDateTime(date_time)
         self._timer.reset(self.getNextExecutionDelay())
+        self.manager._journalEvent(EVENT_RESCHEDULE, self.job_id,
+                                   self._timer.getTime())
 
 class IntervalJob(AbstractBaseJob):
 
@@ -189,6 +367,8 @@ class IntervalJob(AbstractBaseJob):
     # XXX: how to pass/set iterations?
     def __init__(self, job_id, manager, interval, func, *args, **kwargs):
         self.df = defer.Deferred()
+        self._user_callbacks = []
+        self._user_errbacks = []
         self.job_id = job_id
         self.manager = manager
         self.func = func
@@ -203,19 +383,26 @@ class IntervalJob(AbstractBaseJob):
 
     def _post_exec_hook(self, result):
         if not self.last_exec_time:
-            self.last_exec_time = reactor.seconds()
+            self.last_exec_time = self.manager.seconds()
 
-        self.times_executed += 1
         self.next_exec_time = self.last_exec_time + self.interval
-        if self.iterations and self.iterations >= self.times_executed:
-            self.manager.removeJob(self.job_id)
-        else:
+        if self.iterations and self.times_executed >= self.iterations:
+            if not self._cancelled:
+                self.manager.removeJob(self.job_id)
+        elif not self._cancelled:
             self.manager.scheduleJob(self.job_id)
 
         return result
 
+    def _getNextRunTime(self):
+        return self.last_exec_time + self.interval
+
+    def _misfire(self):
+        self.next_exec_time = self.manager.seconds() + self.interval
+        self.manager.scheduleJob(self.job_id)
+
     def getNextExecutionDelay(self):
-        delay = self.next_exec_time - reactor.seconds()
+        delay = self.next_exec_time - self.manager.seconds()
         if delay < 0.1:
             delay = 0.1
 
@@ -228,3 +415,47 @@ class IntervalJob(AbstractBaseJob):
             raise ValueError("Expected an int, float or long")
 
         self._timer.reset(self.getNextExecutionDelay())
+        self.manager._journalEvent(EVENT_RESCHEDULE, self.job_id,
+                                   self._timer.getTime())
+
+class DependentJob(AbstractBaseJob):
+    """A job without a schedule of its own.  It runs as soon as all of
+       its upstream jobs have completed in the same cycle; with the
+       default trigger, TRIGGER_SUCCESS, a failed upstream run starts
+       a new cycle.
+    """
+
+    implements(IJob)
+
+    upstreams = None
+    trigger = TRIGGER_SUCCESS
+
+    def __init__(self, job_id, manager, upstreams, func, *args, **kwargs):
+        self.df = defer.Deferred()
+        self._user_callbacks = []
+        self._user_errbacks = []
+        self.job_id = job_id
+        self.manager = manager
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.upstreams = set(upstreams)
+        self._completed = set()
+
+    def _upstreamCompleted(self, job_id, succeeded):
+        if not succeeded and self.trigger == TRIGGER_SUCCESS:
+            self._completed.clear()
+            return
+
+        self._completed.add(job_id)
+        if self._completed >= self.upstreams:
+            self._completed.clear()
+            self.manager._triggerJob(self)
+
+    def getNextExecutionDelay(self):
+        # Never due on its own, see _upstreamCompleted()
+        return None
+
+    def reschedule(self, upstreams):
+        self.manager._setUpstreams(self, upstreams)
+        self._completed.clear()
@@ -0,0 +1,322 @@
+import os
+import sys
+import mmap
+import struct
+from optparse import OptionParser
+
+from txcron.history import OUTCOMES, OUTCOME_NONE
+
+EVENT_SCHEDULE = 1
+EVENT_FIRE = 2
+EVENT_COMPLETE = 3
+EVENT_CANCEL = 4
+EVENT_RESCHEDULE = 5
+
+EVENTS = {
+EVENT_SCHEDULE:'schedule',
+EVENT_FIRE:'fire',
+EVENT_COMPLETE:'complete',
+EVENT_CANCEL:'cancel',
+EVENT_RESCHEDULE:'reschedule'
+}
+
+MAGIC = 'TXCRONJ1'
+
+# The file starts with a header padded to the size of one record,
+# followed by records of (time, job_id, when, event, outcome).
+HEADER = struct.Struct('<8sI20x')
+RECORD = struct.Struct('<dqdBB6x')
+
+RECORD_FIELDS = {
+    'names': ['time', 'job_id', 'when', 'event', 'outcome'],
+    'formats': ['<f8', '<i8', '<f8', 'u1', 'u1'],
+    'offsets': [0, 8, 16, 24, 25],
+    'itemsize': RECORD.size}
+
+# Records buffered before they are written out, and the longest time in
+# seconds a record stays in the buffer.
+DEFAULT_BUFFER_SIZE = 4096
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+class JournalError(Exception): pass
+
+def _importNumpy():
+    # numpy is optional and only loaded by the reader, it takes longer
+    # to import than the rest of txcron together.
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+class Journal(object):
+    """An append-only file of fixed-size scheduling event records.
+
+       Records are packed into a preallocated buffer and written with
+       a single write when the buffer is full or flush_interval seconds
+       after the first record went into it, so a crash loses at most
+       that much of the journal.  Each record holds the time of the
+       event, the job id, the event type, the time the event refers to
+       (the due time for schedule, reschedule and fire events, the
+       start time for complete events) and the outcome of complete
+       events.
+
+       >>> journal = Journal('/var/log/txcron.journal')
+       >>> sched = Scheduler(journal=journal)
+       >>> reactor.addSystemEventTrigger('before', 'shutdown', journal.close)
+
+       Closing the journal detaches it from the scheduler, which goes on
+       without journaling.
+
+       Read it back with JournalReader or python -m txcron.journal.
+    """
+
+    scheduler = None
+    _timer = None
+
+    def __init__(self, path, buffer_size=DEFAULT_BUFFER_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        if buffer_size < 1:
+            raise ValueError("buffer_size must be at least 1")
+
+        self.path = path
+        self.flush_interval = flush_interval
+        self._buffer = bytearray(buffer_size * RECORD.size)
+        self._offset = 0
+        self.written = 0
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0644)
+        try:
+            self._checkFile(fd)
+        except:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def _checkFile(self, fd):
+        size = os.fstat(fd).st_size
+        if not size:
+            os.write(fd, HEADER.pack(MAGIC, RECORD.size))
+            return
+
+        header = os.read(fd, HEADER.size)
+        if len(header) != HEADER.size \
+        or HEADER.unpack(header) != (MAGIC, RECORD.size):
+            raise JournalError("%s is not a journal" % (self.path,))
+
+        # Drop a partial record left by a crash, the next ones would be
+        # misaligned otherwise.
+        extra = (size - HEADER.size) % RECORD.size
+        if extra:
+            os.ftruncate(fd, size - extra)
+
+    def bind(self, scheduler):
+        self.scheduler = scheduler
+
+    def append(self, time, event, job_id, when=0.0, outcome=OUTCOME_NONE):
+        if self._fd is None:
+            raise JournalError("Journal is closed")
+
+        RECORD.pack_into(self._buffer, self._offset,
+                         time, job_id, when, event, outcome)
+        self._offset += RECORD.size
+        if self._offset == len(self._buffer):
+            self.flush()
+        elif self._timer is None and self.scheduler is not None:
+            self._timer = self.scheduler.timers.callLater(self.flush_interval,
+                                                          self.flush)
+
+    def flush(self):
+        """Writes out the buffered records."""
+        if self._timer is not None:
+            if self._timer.active():
+                self._timer.cancel()
+            self._timer = None
+
+        if self._offset and self._fd is not None:
+            data = memoryview(self._buffer)[:self._offset]
+            while data:
+                data = data[os.write(self._fd, data):]
+            self.written += self._offset // RECORD.size
+            self._offset = 0
+
+    def close(self):
+        if self.scheduler is not None and self.scheduler.journal is self:
+            self.scheduler.journal = None
+        if self._fd is not None:
+            self.flush()
+            os.close(self._fd)
+            self._fd = None
+
+class JournalReader(object):
+    """Memory-mapped, read-only view of a journal.
+
+       Records are returned as (time, job_id, when, event, outcome)
+       tuples in the order they were written.  The since/until lookups
+       bisect on the record time, which assumes the clock of the
+       scheduler didn't step back while the journal was written.
+
+       When numpy is installed the records are also available as a
+       structured array, see getArray(), and filtering runs on that
+       array instead of unpacking every record.
+    """
+
+    def __init__(self, path):
+        f = open(path, 'rb')
+        try:
+            header = f.read(HEADER.size)
+            if len(header) != HEADER.size \
+            or HEADER.unpack(header) != (MAGIC, RECORD.size):
+                raise JournalError("%s is not a journal" % (path,))
+            size = os.fstat(f.fileno()).st_size
+            self._map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+
+        self.path = path
+        self._count = (size - HEADER.size) // RECORD.size
+        self._numpy = _importNumpy()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size)
+
+    def _bisect(self, time):
+        # Index of the first record at or after time.
+        lo, hi = 0, self._count
+        unpack = struct.Struct('<d').unpack_from
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if unpack(self._map, HEADER.size + mid * RECORD.size)[0] < time:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _getRange(self, since, until):
+        start = 0
+        end = self._count
+        if since is not None:
+            start = self._bisect(since)
+        if until is not None:
+            end = self._bisect(until)
+        return start, max(start, end)
+
+    def getArray(self):
+        """Returns the records as a numpy structured array backed by the
+           file mapping, without copying them.
+        """
+        numpy = self._numpy
+        if numpy is None:
+            raise JournalError("numpy is not installed")
+        return numpy.frombuffer(self._map, dtype=numpy.dtype(RECORD_FIELDS),
+                                count=self._count, offset=HEADER.size)
+
+    def _select(self, start, end, job_id, event):
+        records = self.getArray()[start:end]
+        numpy = self._numpy
+        mask = numpy.ones(len(records), dtype=bool)
+        if job_id is not None:
+            mask &= records['job_id'] == job_id
+        if event is not None:
+            mask &= records['event'] == event
+        return numpy.flatnonzero(mask) + start
+
+    def iterRecords(self, since=None, until=None, job_id=None, event=None):
+        """Iterates over the records with since <= time < until, of one
+           job and/or one event type.
+        """
+        start, end = self._getRange(since, until)
+        if self._numpy is not None:
+            for index in self._select(start, end, job_id, event):
+                yield self[int(index)]
+            return
+
+        unpack = RECORD.unpack_from
+        offset = HEADER.size + start * RECORD.size
+        for index in xrange(start, end):
+            record = unpack(self._map, offset)
+            offset += RECORD.size
+            if job_id is not None and record[1] != job_id:
+                continue
+            if event is not None and record[3] != event:
+                continue
+            yield record
+
+    def countRecords(self, since=None, until=None, job_id=None, event=None):
+        """Returns the number of records iterRecords() would return."""
+        if job_id is None and event is None:
+            start, end = self._getRange(since, until)
+            return end - start
+        if self._numpy is not None:
+            start, end = self._getRange(since, until)
+            return len(self._select(start, end, job_id, event))
+
+        count = 0
+        for record in self.iterRecords(since, until, job_id, event):
+            count += 1
+        return count
+
+    def close(self):
+        self._map.close()
+
+def formatRecord(record):
+    time, job_id, when, event, outcome = record
+    line = '%.6f %-10s %8d %.6f' % (time, EVENTS.get(event, event),
+                                    job_id, when)
+    if event == EVENT_COMPLETE:
+        line += ' ' + OUTCOMES.get(outcome, str(outcome))
+    return line
+
+def main(argv=None, out=sys.stdout):
+    """Command line query tool:
+
+       python -m txcron.journal -j 42 -e fire -s 1262304000 txcron.journal
+    """
+    parser = OptionParser(usage='%prog [options] JOURNAL')
+    parser.add_option('-j', '--job', type='int', dest='job_id',
+                      help='only records of this job id')
+    parser.add_option('-e', '--event', choices=EVENTS.values(),
+                      help='only records of this event type')
+    parser.add_option('-s', '--since', type='float',
+                      help='only records at or after this timestamp')
+    parser.add_option('-u', '--until', type='float',
+                      help='only records before this timestamp')
+    parser.add_option('-n', '--limit', type='int',
+                      help='print at most this many records')
+    parser.add_option('-c', '--count', action='store_true',
+                      help='print the number of matching records only')
+    options, args = parser.parse_args(argv)
+    if len(args) != 1:
+        parser.error('expected one journal file')
+
+    event = None
+    if options.event is not None:
+        event = dict([(v, k) for k, v in EVENTS.items()])[options.event]
+
+    try:
+        reader = JournalReader(args[0])
+    except (IOError, JournalError), e:
+        parser.error(str(e))
+
+    try:
+        query = (options.since, options.until, options.job_id, event)
+        if options.count:
+            out.write('%d\n' % (reader.countRecords(*query),))
+            return
+
+        for n, record in enumerate(reader.iterRecords(*query)):
+            if options.limit is not None and n >= options.limit:
+                break
+            out.write(formatRecord(record) + '\n')
+    finally:
+        reader.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+from collections import deque
+
+class TokenBucket(object):
+    """Allows rate events per second on average with bursts of up to
+       burst events.
+    """
+
+    def __init__(self, rate, burst, now):
+        if rate <= 0:
+            raise ValueError("rate must be a positive number")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.updated = now
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def consume(self, now):
+        """Takes a token if one is available.  Returns True on success."""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def getDelay(self, now):
+        """Returns the seconds until the next token is available."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+class _PriorityLevel(object):
+    """The queued jobs of one priority: a FIFO queue per tag and the
+       round robin order of the tags.
+    """
+
+    def __init__(self):
+        self.queues = {}
+        self.order = deque()
+
+    def append(self, tag, entry):
+        try:
+            queue = self.queues[tag]
+        except KeyError:
+            queue = self.queues[tag] = deque()
+            self.order.append(tag)
+        queue.append(entry)
+
+class DispatchLimiter(object):
+    """Smooths job dispatch with a token bucket.
+
+       Due jobs are queued by job priority and tag.  Higher priorities
+       are always served first.  Within a priority there is one FIFO
+       queue per tag and the queues are served round robin, so a large
+       group of jobs with the same tag can't starve the others.  With
+       per_tag=True every tag gets its own bucket of rate/burst,
+       otherwise all jobs share one.
+
+       A job that has waited longer than deadline seconds is dropped
+       as a misfire and scheduled for its next regular run.
+
+       >>> sched = Scheduler(limiter=DispatchLimiter(100, burst=500))
+    """
+
+    scheduler = None
+
+    def __init__(self, rate, burst=1, per_tag=False, deadline=None):
+        self.rate = rate
+        self.burst = burst
+        self.per_tag = per_tag
+        self.deadline = deadline
+
+        self._buckets = {}
+        self._levels = {}
+        self._timer = None
+
+        # Statistics
+        self.released = 0
+        self.misfires = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def bind(self, scheduler):
+        self.scheduler = scheduler
+
+    def _getBucket(self, tag):
+        if not self.per_tag:
+            tag = None
+
+        try:
+            return self._buckets[tag]
+        except KeyError:
+            bucket = TokenBucket(self.rate, self.burst,
+                                 self.scheduler.seconds())
+            self._buckets[tag] = bucket
+            return bucket
+
+    def _release(self):
+        now = self.scheduler.seconds()
+        waiting = []
+        for priority in sorted(self._levels, reverse=True):
+            level = self._levels[priority]
+            self._releaseLevel(level, now)
+            if level.order:
+                waiting.extend(level.order)
+            else:
+                del self._levels[priority]
+
+        if waiting:
+            delay = min([self._getBucket(tag).getDelay(now)
+                         for tag in waiting])
+            self._schedule(delay)
+
+    def _releaseLevel(self, level, now):
+        order = level.order
+        blocked = 0
+
+        # Serve the tags round robin until every remaining one is
+        # waiting on its bucket.
+        while order and blocked < len(order):
+            tag = order.popleft()
+            queue = level.queues[tag]
+            self._expire(queue, now)
+            if not queue:
+                del level.queues[tag]
+                continue
+
+            if self._getBucket(tag).consume(now):
+                queued_at, job = queue.popleft()
+                self._releaseJob(job, now - queued_at)
+                blocked = 0
+                if queue:
+                    order.append(tag)
+                else:
+                    del level.queues[tag]
+            else:
+                order.append(tag)
+                blocked += 1
+
+    def _expire(self, queue, now):
+        while queue:
+            queued_at, job = queue[0]
+            if job._cancelled or job._paused:
+                queue.popleft()
+                job._queued = False
+            elif self.deadline is not None and now - queued_at > self.deadline:
+                queue.popleft()
+                job._queued = False
+                self.misfires += 1
+                job.misfires += 1
+                job._misfire()
+            else:
+                break
+
+    def _releaseJob(self, job, wait):
+        job._queued = False
+        self.released += 1
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+        self.scheduler._execute(job)
+
+    def _schedule(self, delay):
+        if self._timer is not None and self._timer.active():
+            if self._timer.getTime() <= self.scheduler.seconds() + delay:
+                return
+            self._timer.reset(delay)
+        else:
+            self._timer = self.scheduler.timers.callLater(delay,
+                                                          self._release)
+
+    def _iterQueues(self, tag=None):
+        for level in self._levels.itervalues():
+            if tag is None:
+                for queue in level.queues.itervalues():
+                    yield queue
+            elif tag in level.queues:
+                yield level.queues[tag]
+
+    # Public API
+
+    def submit(self, job):
+        """Dispatches job now if the rate allows, otherwise queues it.
+           A job that is queued already, e.g. because it was paused and
+           resumed while it waited, keeps its place and isn't queued
+           twice.
+        """
+        if job._queued:
+            return
+
+        now = self.scheduler.seconds()
+        tag = job.tag
+        if not self._levels and self._getBucket(tag).consume(now):
+            self._releaseJob(job, 0.0)
+            return
+
+        try:
+            level = self._levels[job.priority]
+        except KeyError:
+            level = self._levels[job.priority] = _PriorityLevel()
+
+        level.append(tag, (now, job))
+        job._queued = True
+        self._schedule(self._getBucket(tag).getDelay(now))
+
+    def getDepth(self, tag=None):
+        """Returns the number of queued jobs, for one tag or in total."""
+        return sum([len(q) for q in self._iterQueues(tag)])
+
+    def getMeanWait(self):
+        if not self.released:
+            return 0.0
+        return self.total_wait / self.released
+
+    def getOldestWait(self):
+        """Returns how long the longest waiting queued job has waited."""
+        now = self.scheduler.seconds()
+        heads = [q[0][0] for q in self._iterQueues() if q]
+        if not heads:
+            return 0.0
+        return now - min(heads)
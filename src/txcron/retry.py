@@ -0,0 +1,41 @@
+import random
+
+class RetryPolicy(object):
+    """Describes how a failed job run is retried.
+
+       The n-th retry waits backoff * factor ** (n - 1) seconds, capped
+       at max_delay.  jitter is the fraction of that delay which is
+       randomized, so jobs that failed together don't retry together.
+       Only failures matching one of the retry_on exception types are
+       retried, and a run is attempted at most max_attempts times.
+
+       >>> job = sched.addJob('0 * * * *', refresh)
+       >>> job.retry = RetryPolicy(max_attempts=5, retry_on=(IOError,))
+    """
+
+    def __init__(self, max_attempts=3, backoff=1.0, factor=2.0,
+                 max_delay=300.0, jitter=0.5, retry_on=(Exception,)):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if not 0 <= jitter <= 1:
+            raise ValueError("jitter must be between 0 and 1")
+
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_on = tuple(retry_on)
+
+    def shouldRetry(self, reason, attempt):
+        """Returns True if the Failure reason of attempt (counting from
+           1) should be retried.
+        """
+        if attempt >= self.max_attempts:
+            return False
+        return reason.check(*self.retry_on) is not None
+
+    def getDelay(self, attempt):
+        """Returns the seconds to wait before retrying attempt."""
+        delay = min(self.max_delay, self.backoff * self.factor ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
@@ -1,10 +1,24 @@
 from datetime import datetime
+from bisect import bisect_right
 
 from zope.interface import implements
-from twisted.internet import reactor, defer
+from twisted.internet import defer
+from twisted.python import failure
 
 from txcron.interfaces import IScheduler
-from txcron.jobs import CronJob, DateJob, IntervalJob
+from txcron.jobs import CronJob, DateJob, IntervalJob, DependentJob
+from txcron.timers import TimerQueue
+from txcron.bulk import OneShotStore
+from txcron.ratelimit import TokenBucket
+from txcron.history import ExecutionHistory, FailureLog, DEFAULT_SIZE
+from txcron.history import OUTCOME_SUCCESS, OUTCOME_NONE
+from txcron.journal import EVENT_SCHEDULE, EVENT_RESCHEDULE, EVENT_COMPLETE
+
+# Retries of all jobs together are limited to RETRY_RATE per second
+# with bursts of up to RETRY_BURST.  Failed runs beyond that wait for
+# their next regular run.
+RETRY_RATE = 50
+RETRY_BURST = 500
 
 class SchedulerError(Exception): pass
 
@@ -13,17 +27,246 @@ class Scheduler(object):
     implements(IScheduler) 
 
     __jobIdIter = 0
-    __tasklist = {}
+    __tasklist = None
+
+    # Dispatch counters, mostly of interest when simulating a schedule.
+    executions = 0
+    running = 0
+    peak_running = 0
+
+    def __init__(self, clock=None, limiter=None, history_size=DEFAULT_SIZE,
+                 default_timeout=None, journal=None):
+        """clock is an IReactorTime provider used for all timers and as
+           the time source for the schedule math.  It defaults to the
+           global reactor; pass a twisted.internet.task.Clock to drive
+           the schedule by hand.
+
+           limiter is an optional txcron.ratelimit.DispatchLimiter that
+           due jobs are passed through before they execute.
+
+           history_size is the number of executions each job remembers,
+           see txcron.history.  0 disables the per-job history.
+
+           default_timeout is the number of seconds after which a run of
+           a job without a timeout of its own is cancelled.
+
+           journal is an optional txcron.journal.Journal that schedule,
+           fire, completion, cancel and reschedule events are written to.
+        """
+        if clock is None:
+            # Looked up only now, so that importing txcron doesn't
+            # install the default reactor.
+            from twisted.internet import reactor as clock
+
+        self.clock = clock
+        self.timers = TimerQueue(clock)
+        self.limiter = limiter
+        self.history_size = history_size
+        self.default_timeout = default_timeout
+        self.journal = journal
+        self.retry_budget = TokenBucket(RETRY_RATE, RETRY_BURST,
+                                        clock.seconds())
+        self.failures = FailureLog()
+        self.oneshots = OneShotStore(self)
+        self.__tasklist = {}
+
+        # Job ids in ascending order for paging; removed ids are only
+        # dropped now and then, see _removeFromTable()
+        self.__ids = []
+        self.__stale_ids = 0
 
-    def __init__(self):
-        pass
+        # upstream job_id -> set of DependentJob ids
+        self.__downstream = {}
+
+        # batch_key -> (batch_func, max_size) and the jobs waiting
+        self.__batchers = {}
+        self.__batches = {}
+
+        if limiter is not None:
+            limiter.bind(self)
+        if journal is not None:
+            journal.bind(self)
 
     def _getNextJobId(self):
         self.__jobIdIter = self.__jobIdIter + 1
         return self.__jobIdIter
 
+    def _addToTable(self, job):
+        # Ids only ever grow, so appending keeps self.__ids sorted.
+        self.__tasklist[job.job_id] = job
+        self.__ids.append(job.job_id)
+
+    def _removeFromTable(self, job_id):
+        del self.__tasklist[job_id]
+        self.__stale_ids += 1
+        if self.__stale_ids > 64 and self.__stale_ids * 2 > len(self.__ids):
+            tasklist = self.__tasklist
+            self.__ids = [i for i in self.__ids if i in tasklist]
+            self.__stale_ids = 0
+
+    def _dispatch(self, job):
+        if self.limiter is not None:
+            self.limiter.submit(job)
+        else:
+            self._execute(job)
+
+    def _dispatchOneShot(self, fire_time, func, args, kwargs):
+        # Called by the OneShotStore when an entry is due.  The job skips
+        # the per-job history since it is removed once it has run, and
+        # has no timer to take its scheduled time from.
+        job_id = self._getNextJobId()
+        job = DateJob(job_id, self, datetime.fromtimestamp(fire_time),
+                      func, *args, **kwargs)
+        job._due_time = fire_time
+        self._addToTable(job)
+        self._dispatch(job)
+
+    def _triggerJob(self, job):
+        if job._cancelled or job._paused:
+            return
+        if job._timer is not None and job._timer.active():
+            return
+
+        job._timer = self.timers.callLater(0, self._dispatch, job)
+        job._timer.priority = job.priority
+        self._journalEvent(EVENT_SCHEDULE, job.job_id, job._timer.getTime())
+
+    def _jobCompleted(self, job, succeeded):
+        downstream = self.__downstream.get(job.job_id)
+        if downstream:
+            for job_id in list(downstream):
+                self.__tasklist[job_id]._upstreamCompleted(job.job_id,
+                                                           succeeded)
+
+    def _setUpstreams(self, job, upstreams):
+        ids = set()
+        for upstream in upstreams:
+            if not isinstance(upstream, (int, long)):
+                upstream = upstream.job_id
+            self.getJob(upstream)
+            ids.add(upstream)
+
+        # Refuse edges that would make the job its own ancestor.
+        seen = set()
+        pending = [job.job_id]
+        while pending:
+            job_id = pending.pop()
+            if job_id in ids:
+                raise SchedulerError("Job %d would depend on itself" %
+                                     (job.job_id,))
+            for child in self.__downstream.get(job_id, ()):
+                if child not in seen:
+                    seen.add(child)
+                    pending.append(child)
+
+        self._unlinkUpstreams(job)
+        job.upstreams = ids
+        for upstream in ids:
+            self.__downstream.setdefault(upstream, set()).add(job.job_id)
+
+    def _unlinkUpstreams(self, job):
+        for upstream in job.upstreams or ():
+            downstream = self.__downstream.get(upstream)
+            if downstream is not None:
+                downstream.discard(job.job_id)
+                if not downstream:
+                    del self.__downstream[upstream]
+
+    def _execute(self, job):
+        if job.batch_key is not None and job.batch_key in self.__batchers:
+            self._addToBatch(job)
+        else:
+            self._start(job)
+
+    def _start(self, job, result_df=None):
+        self.executions += 1
+        self.running += 1
+        if self.running > self.peak_running:
+            self.peak_running = self.running
+
+        df = job.execute(result_df)
+        df.addBoth(self._jobFinished)
+
+    def _addToBatch(self, job):
+        key = job.batch_key
+        batch_func, max_size = self.__batchers[key]
+        try:
+            jobs = self.__batches[key]
+        except KeyError:
+            # Everything dispatched in this pass of the timers joins the
+            # batch, which is sent at the start of the next pass.
+            jobs = self.__batches[key] = []
+            self.timers.callLater(0, self._flushBatch, key)
+
+        jobs.append(job)
+        if max_size and len(jobs) >= max_size:
+            self._flushBatch(key)
+
+    def _flushBatch(self, key):
+        jobs = self.__batches.pop(key, None)
+        if jobs:
+            jobs = [j for j in jobs if not (j._cancelled or j._paused)]
+        if not jobs:
+            return
+
+        batch_func = self.__batchers[key][0]
+        results = [defer.Deferred() for job in jobs]
+        for job, result_df in zip(jobs, results):
+            self._start(job, result_df)
+
+        df = defer.maybeDeferred(batch_func, [job.args for job in jobs])
+        df.addCallback(self._fanOutBatch, results)
+        df.addErrback(self._failBatch, results)
+
+    def _fanOutBatch(self, values, results):
+        values = list(values)
+        if len(values) != len(results):
+            raise ValueError("Batch returned %d results for %d jobs" %
+                             (len(values), len(results)))
+
+        for value, result_df in zip(values, results):
+            # A job that timed out in the meantime already has a result.
+            if result_df.called:
+                continue
+            if isinstance(value, (Exception, failure.Failure)):
+                result_df.errback(value)
+            else:
+                result_df.callback(value)
+
+    def _failBatch(self, reason, results):
+        # The failure is passed on to, and reported by, every job.
+        for result_df in results:
+            if not result_df.called:
+                result_df.errback(reason)
+
+    def _jobFinished(self, result):
+        self.running -= 1
+        return result
+
+    def _recordExecution(self, job, scheduled, start, end, outcome, error):
+        if job.history is not None:
+            job.history.record(scheduled, start, end, outcome, error)
+        if outcome != OUTCOME_SUCCESS:
+            self.failures.record(job.job_id, scheduled, start, end,
+                                 outcome, error)
+        self._journalEvent(EVENT_COMPLETE, job.job_id, start, outcome)
+
+    def _journalEvent(self, event, job_id, when=0.0, outcome=OUTCOME_NONE):
+        if self.journal is not None:
+            self.journal.append(self.clock.seconds(), event, job_id,
+                                when, outcome)
+
     # Public API
 
+    def seconds(self):
+        return self.clock.seconds()
+
+    def now(self):
+        """Returns the current time of the scheduler's clock as a
+           datetime.datetime object.
+        """
+        return datetime.fromtimestamp(self.clock.seconds())
+
     def addJob(self, schedule, func, *args, **kwargs):
         """Create a new CronJob, IntervalJob or DateJob and add
            it to the schedule.
@@ -47,14 +290,67 @@ class Scheduler(object):
             raise ValueError("Could not evaluate which job type \
                               to create based on the schedule")
 
-        self.__tasklist[job_id] = job
-        self.scheduleJob(job_id)
+        if self.history_size:
+            job.history = ExecutionHistory(self.history_size)
+
+        self._addToTable(job)
+        try:
+            self.scheduleJob(job_id)
+        except:
+            self._removeFromTable(job_id)
+            raise
+        return job
+
+    def addDependentJob(self, upstreams, func, *args, **kwargs):
+        """Create a new DependentJob that runs func each time all of
+           the upstream jobs (jobs or job ids) completed.
+
+           Returns an object implementing the txcron.interfaces.IJob
+           interface
+        """
+        if not callable(func):
+            raise ValueError("'func' must be callable")
+
+        job_id = self._getNextJobId()
+        job = DependentJob(job_id, self, (), func, *args, **kwargs)
+        self._setUpstreams(job, upstreams)
+
+        if self.history_size:
+            job.history = ExecutionHistory(self.history_size)
+
+        self._addToTable(job)
         return job
 
+    def registerBatch(self, batch_key, batch_func, max_size=None):
+        """Coalesce the runs of jobs whose batch_key is batch_key.
+
+           Jobs with that key which are due in the same pass of the
+           timers are run with a single call of batch_func, passing the
+           list of their args tuples.  batch_func returns, or returns a
+           Deferred firing with, one result per job in the same order.
+           Each result goes down its own job's callback chain; exception
+           instances in the results fail only that job.  Job kwargs are
+           not passed, and retries call the job's own func.
+
+           At most max_size jobs are sent in one call.
+        """
+        if not callable(batch_func):
+            raise ValueError("'batch_func' must be callable")
+        self.__batchers[batch_key] = (batch_func, max_size)
+
+    def unregisterBatch(self, batch_key):
+        self._flushBatch(batch_key)
+        del self.__batchers[batch_key]
+
     def removeJob(self, job_id):
         job = self.getJob(job_id)
         job.cancel()
-        del self.__tasklist[job_id]
+        self._removeFromTable(job_id)
+
+        if isinstance(job, DependentJob):
+            self._unlinkUpstreams(job)
+        for downstream in self.__downstream.pop(job_id, ()):
+            self.__tasklist[downstream].upstreams.discard(job_id)
 
     def cancelJob(self, job_id):
         job = self.getJob(job_id)
@@ -70,15 +366,24 @@ class Scheduler(object):
 
     def scheduleJob(self, job_id):
         job = self.getJob(job_id)
+        if job._cancelled or job._paused:
+            return
+
         delay = job.getNextExecutionDelay()
+        if delay is None:
+            return
         if delay < 0.0:
             delay = 0.1
 
         if job._timer and job._timer.active():
             # XXX: should throw an error here?
             job._timer.reset(delay)
+            event = EVENT_RESCHEDULE
         else:
-            job._timer = reactor.callLater(delay, job.execute)
+            job._timer = self.timers.callLater(delay, self._dispatch, job)
+            event = EVENT_SCHEDULE
+        job._timer.priority = job.priority
+        self._journalEvent(event, job_id, job._timer.getTime())
 
     def getJob(self, job_id):
         try:
@@ -89,5 +394,33 @@ class Scheduler(object):
     def getJobs(self):
         return self.__tasklist.values()
 
+    def iterJobsAfter(self, job_id=0):
+        """Iterates over the jobs with an id greater than job_id in id
+           order, so a listing can be resumed from the last id seen.
+           Jobs must not be removed while iterating.
+        """
+        ids = self.__ids
+        tasklist = self.__tasklist
+        for i in xrange(bisect_right(ids, job_id), len(ids)):
+            job = tasklist.get(ids[i])
+            if job is not None:
+                yield job
+
+    def getJobCount(self):
+        return len(self.__tasklist)
+
+    def iterUpcomingJobs(self):
+        """Iterates over the scheduled jobs, the soonest due first."""
+        for timer in self.timers.iterPending():
+            if timer.func == self._dispatch:
+                yield timer.args[0]
+
     def getPausedJobs(self):
         return [job for job in self.__tasklist.values() if job._paused is True]
+
+    def getRecentFailures(self, limit=None):
+        """Returns the most recent failed executions across all jobs as
+           (job_id, scheduled, start, end, outcome, error) tuples,
+           newest first.
+        """
+        return self.failures.getRecords(limit)
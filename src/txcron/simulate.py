@@ -0,0 +1,115 @@
+import time
+from datetime import datetime
+
+from twisted.internet import task
+
+from txcron.scheduler import Scheduler
+from txcron.timers import EPSILON
+
+class _DryRunScheduler(Scheduler):
+    """Counts due jobs and moves them on to their next run without
+       calling their functions or building their Deferred chains.
+    """
+
+    def _execute(self, job):
+        self.executions += 1
+        job.last_exec_time = self.clock.seconds()
+        job.times_executed += 1
+        self._jobCompleted(job, True)
+        job._post_exec_hook(None)
+
+class SimulationReport(object):
+    """Result of Simulator.run().  executions holds the number of jobs
+       dispatched during each tick of the simulation.
+    """
+
+    def __init__(self, start, tick):
+        self.start = start
+        self.tick = tick
+        self.executions = []
+        self.peak_concurrency = 0
+
+    def getTotalExecutions(self):
+        return sum(self.executions)
+
+    def getPeakExecutions(self):
+        """Returns (tick_start_time, count) for the busiest tick."""
+        if not self.executions:
+            return (self.start, 0)
+        count = max(self.executions)
+        index = self.executions.index(count)
+        return (self.start + index * self.tick, count)
+
+class Simulator(object):
+    """Replays a schedule faster than real time.
+
+       Jobs are added to self.scheduler as usual.  The scheduler runs on
+       a twisted.internet.task.Clock which run() advances from one due
+       timer to the next, so a week of jobs takes only as long as the
+       jobs themselves take to dispatch.
+
+       >>> sim = Simulator(datetime(2010, 1, 4))
+       >>> sim.scheduler.addJob('*/5', func)
+       >>> report = sim.run(7 * 24 * 3600, tick=3600)
+
+       Every run still goes through the job's function, history and
+       callbacks, which limits a simulation to some 15,000 runs per
+       second.  With dry_run=True due jobs are only counted and
+       rescheduled, several times as fast, for forecasting the load of
+       large schedules.  Runs then take no time, so peak_concurrency
+       stays 0.
+    """
+
+    def __init__(self, start=None, dry_run=False):
+        if start is None:
+            start = time.time()
+        elif isinstance(start, datetime):
+            start = time.mktime(start.timetuple())
+
+        self.clock = task.Clock()
+        self.clock.advance(start)
+        if dry_run:
+            self.scheduler = _DryRunScheduler(clock=self.clock)
+        else:
+            self.scheduler = Scheduler(clock=self.clock)
+
+    def work(self, seconds, result=None):
+        """Returns a Deferred firing with result after seconds of
+           simulated time.  Job functions can return this to model
+           how long they run for.
+        """
+        return task.deferLater(self.clock, seconds, lambda: result)
+
+    def run(self, duration, tick=60.0):
+        """Advances the clock by duration seconds and returns a
+           SimulationReport with the executions counted per tick.
+        """
+        if tick <= 0:
+            raise ValueError("tick must be a positive number")
+
+        clock = self.clock
+        sched = self.scheduler
+        now = clock.seconds()
+        end = now + duration
+        report = SimulationReport(now, tick)
+
+        while now < end:
+            tick_end = min(now + tick, end)
+            executions = sched.executions
+            sched.peak_running = sched.running
+
+            while now < tick_end:
+                calls = clock.getDelayedCalls()
+                if calls:
+                    step = min(calls[0].getTime(), tick_end) - now
+                else:
+                    step = tick_end - now
+                # Never take a step too small to move the clock along.
+                clock.advance(step > 0 and max(step, EPSILON) or 0)
+                now = clock.seconds()
+
+            report.executions.append(sched.executions - executions)
+            if sched.peak_running > report.peak_concurrency:
+                report.peak_concurrency = sched.peak_running
+
+        return report
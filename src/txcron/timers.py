@@ -0,0 +1,217 @@
+import heapq
+from itertools import count
+
+from twisted.python import log
+from twisted.internet.error import AlreadyCalled, AlreadyCancelled
+
+# Timers that come due within EPSILON seconds of the clock are fired in
+# the current pass.  This absorbs float rounding when the underlying
+# DelayedCall is armed for (when - now) seconds.
+EPSILON = 1e-6
+
+class Timer(object):
+    """A pending call in a TimerQueue.  Supports the subset of the
+       twisted.internet.base.DelayedCall interface used by the jobs.
+
+       Among timers that come due in the same pass, the ones with a
+       higher priority are called first.
+    """
+
+    priority = 0
+
+    def __init__(self, queue, time, func, args, kwargs):
+        self.queue = queue
+        self.time = time
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.called = False
+        self.cancelled = False
+        self._seq = None
+
+    def getTime(self):
+        return self.time
+
+    def active(self):
+        return not (self.called or self.cancelled)
+
+    def cancel(self):
+        if self.cancelled:
+            raise AlreadyCancelled
+        if self.called:
+            raise AlreadyCalled
+
+        self.cancelled = True
+        self.queue._discard(self)
+        self.queue._arm()
+
+    def reset(self, secondsFromNow):
+        if self.cancelled:
+            raise AlreadyCancelled
+        if self.called:
+            raise AlreadyCalled
+
+        self.queue._discard(self)
+        self.time = self.queue.seconds() + secondsFromNow
+        self.queue._push(self)
+
+    def delay(self, secondsLater):
+        if self.cancelled:
+            raise AlreadyCancelled
+        if self.called:
+            raise AlreadyCalled
+
+        self.queue._discard(self)
+        self.time = self.time + secondsLater
+        self.queue._push(self)
+
+class TimerQueue(object):
+    """Multiplexes any number of timers onto a single DelayedCall of
+       an IReactorTime provider.
+
+       Pending timers are kept in a binary heap, so adding, resetting
+       and cancelling a timer is O(log n) regardless of how many jobs
+       are scheduled.  Cancelled and reset entries are dropped lazily
+       and the heap is compacted once they make up half of it.
+    """
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._heap = []
+        self._seq = count()
+        self._stale = 0
+        self._call = None
+        self._firing = False
+
+    def __len__(self):
+        return len(self._heap) - self._stale
+
+    def seconds(self):
+        return self.clock.seconds()
+
+    def callLater(self, delay, func, *args, **kwargs):
+        timer = Timer(self, self.seconds() + delay, func, args, kwargs)
+        self._push(timer)
+        return timer
+
+    def getNextTime(self):
+        """Returns the time the earliest pending timer is due or None."""
+        self._dropStale()
+        if self._heap:
+            return self._heap[0][0]
+        return None
+
+    def iterPending(self):
+        """Yields the pending timers in the order they are due.
+
+           The heap is walked through an auxiliary heap of candidate
+           positions, so the first k timers cost O(k log k) no matter
+           how many are pending.  Don't add or cancel timers while
+           iterating.
+        """
+        heap = self._heap
+        if not heap:
+            return
+
+        candidates = [(heap[0], 0)]
+        while candidates:
+            entry, i = heapq.heappop(candidates)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(candidates, (heap[child], child))
+            if entry[2]._seq == entry[1]:
+                yield entry[2]
+
+    def _push(self, timer):
+        timer._seq = next(self._seq)
+        heapq.heappush(self._heap, (timer.time, timer._seq, timer))
+        # _fire() arms once the whole pass is done.
+        if not self._firing:
+            self._arm()
+
+    def _discard(self, timer):
+        # The heap entry stays behind and is recognized as stale because
+        # its sequence number no longer matches the timer's.
+        if timer._seq is None:
+            return
+        timer._seq = None
+        self._stale += 1
+        if self._stale > 64 and self._stale * 2 > len(self._heap):
+            self._heap = [e for e in self._heap if e[2]._seq == e[1]]
+            heapq.heapify(self._heap)
+            self._stale = 0
+
+    def _dropStale(self):
+        heap = self._heap
+        while heap and heap[0][2]._seq != heap[0][1]:
+            heapq.heappop(heap)
+            self._stale -= 1
+
+    def _arm(self):
+        when = self.getNextTime()
+        call = self._call
+        if when is None:
+            if call is not None and call.active():
+                call.cancel()
+            self._call = None
+            return
+
+        if call is not None and call.active():
+            # An earlier wake up simply re-arms for the next timer.
+            if call.getTime() <= when:
+                return
+            call.reset(max(0, when - self.seconds()))
+        else:
+            self._call = self.clock.callLater(max(0, when - self.seconds()),
+                                              self._fire)
+
+    def _popDue(self):
+        """Removes every timer that is due and returns them ordered by
+           priority, then due time.
+        """
+        deadline = self.seconds() + EPSILON
+        heap = self._heap
+        due = []
+        prioritized = False
+        while heap and heap[0][0] <= deadline:
+            when, seq, timer = heapq.heappop(heap)
+            if timer._seq != seq:
+                self._stale -= 1
+                continue
+            timer._seq = None
+            if timer.priority:
+                prioritized = True
+            due.append((-timer.priority, when, seq, timer))
+
+        # Popped in due time order already, which is all that matters
+        # unless some timer has a priority.
+        if prioritized:
+            due.sort()
+        return due
+
+    def _fire(self):
+        self._call = None
+
+        # Timers added while this batch runs, even with a delay of 0,
+        # wait for the next pass, just like reactor.callLater().
+        self._firing = True
+        try:
+            due = self._popDue()
+            due.reverse()
+            while due:
+                # Popping frees each entry once it's done with, which
+                # keeps the garbage collector quiet on large passes.
+                timer = due.pop()[3]
+                # Skip timers cancelled or reset by an earlier call in
+                # this batch.
+                if timer.cancelled or timer._seq is not None:
+                    continue
+                timer.called = True
+                try:
+                    timer.func(*timer.args, **timer.kwargs)
+                except:
+                    log.err()
+        finally:
+            self._firing = False
+
+        self._arm()
@@ -0,0 +1,327 @@
+import json
+from datetime import datetime
+from itertools import islice
+
+from zope.interface import implements
+from twisted.python import log
+from twisted.internet import task
+from twisted.internet.interfaces import IPushProducer
+from twisted.web import resource, server, http
+
+from txcron.scheduler import SchedulerError
+from txcron.history import OUTCOMES
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 10000
+
+# Jobs looked at for one filtered page at most.
+MAX_PAGE_SCAN = 50000
+
+# Number of jobs serialized per chunk of a streamed listing.
+STREAM_CHUNK = 200
+
+def describeJob(job):
+    """Returns a JSON serializable summary of job."""
+    schedule = getattr(job, 'cron_string', None)
+    if schedule is None:
+        schedule = getattr(job, 'interval', None)
+    if schedule is None:
+        date_time = getattr(job, 'date_time', None)
+        if isinstance(date_time, datetime):
+            schedule = date_time.isoformat()
+    if schedule is None and getattr(job, 'upstreams', None) is not None:
+        schedule = sorted(job.upstreams)
+
+    next_time = None
+    if job._timer is not None and job._timer.active():
+        next_time = job._timer.getTime()
+
+    return {
+        'job_id': job.job_id,
+        'type': job.__class__.__name__,
+        'schedule': schedule,
+        'tag': job.tag,
+        'paused': job._paused,
+        'cancelled': job._cancelled,
+        'next_exec_time': next_time,
+        'last_exec_time': job.last_exec_time or None,
+        'times_executed': job.times_executed,
+        'misfires': job.misfires,
+    }
+
+def describeRecord(record):
+    scheduled, start, end, outcome, error = record[-5:]
+    result = {
+        'scheduled': scheduled,
+        'start': start,
+        'end': end,
+        'outcome': OUTCOMES.get(outcome, outcome),
+        'error': error,
+    }
+    if len(record) > 5:
+        result['job_id'] = record[0]
+    return result
+
+def _intArg(request, name, default, maximum=None):
+    try:
+        value = int(request.args[name][0])
+    except (KeyError, IndexError, ValueError):
+        return default
+    if value < 0:
+        return default
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+class _JSONResource(resource.Resource):
+
+    def __init__(self, scheduler, cooperator=None):
+        resource.Resource.__init__(self)
+        self.scheduler = scheduler
+        self.cooperator = cooperator
+
+    def respond(self, request, obj, code=http.OK):
+        request.setResponseCode(code)
+        request.setHeader('content-type', 'application/json')
+        return json.dumps(obj)
+
+class JobResource(_JSONResource):
+    """GET /jobs/<job_id>: stats and recent history of one job."""
+
+    isLeaf = True
+
+    def __init__(self, scheduler, job_id):
+        _JSONResource.__init__(self, scheduler)
+        self.job_id = job_id
+
+    def render_GET(self, request):
+        try:
+            job = self.scheduler.getJob(self.job_id)
+        except SchedulerError, e:
+            return self.respond(request, {'error': str(e)}, http.NOT_FOUND)
+
+        result = describeJob(job)
+        if job.history is not None:
+            result['history'] = map(describeRecord, job.history.getRecords())
+        return self.respond(request, result)
+
+class BulkActionResource(_JSONResource):
+    """POST /jobs/pause, /jobs/resume and /jobs/remove.  The job ids
+       are passed as repeated id arguments or as a JSON body of the
+       form {"ids": [...]}.
+    """
+
+    isLeaf = True
+
+    def __init__(self, scheduler, action):
+        _JSONResource.__init__(self, scheduler)
+        self.action = action
+
+    def _getIds(self, request):
+        ids = request.args.get('id', [])
+        if not ids:
+            body = request.content.read()
+            if body:
+                ids = json.loads(body).get('ids', [])
+        return map(int, ids)
+
+    def render_POST(self, request):
+        try:
+            ids = self._getIds(request)
+        except (ValueError, TypeError, AttributeError):
+            return self.respond(request, {'error': 'Bad job id list'},
+                                http.BAD_REQUEST)
+
+        method = getattr(self.scheduler, '%sJob' % (self.action,))
+        done = []
+        missing = []
+        for job_id in ids:
+            try:
+                method(job_id)
+            except SchedulerError:
+                missing.append(job_id)
+            else:
+                done.append(job_id)
+        return self.respond(request, {'done': done, 'missing': missing})
+
+class _TaskProducer(object):
+    """Pauses and resumes a cooperative task as the transport of a
+       request asks the producer to.
+    """
+
+    implements(IPushProducer)
+
+    paused = False
+
+    def __init__(self, work):
+        self.work = work
+
+    def pauseProducing(self):
+        if not self.paused:
+            try:
+                self.work.pause()
+            except task.TaskFinished:
+                return
+            self.paused = True
+
+    def resumeProducing(self):
+        if self.paused:
+            self.paused = False
+            self.work.resume()
+
+    def stopProducing(self):
+        try:
+            self.work.stop()
+        except task.TaskFinished:
+            pass
+
+class JobsResource(_JSONResource):
+    """GET /jobs?after=0&limit=500 returns one page of jobs in job id
+       order, starting after the job id given.  The page holds the id to
+       pass as after for the next page, or null on the last page.  With
+       a tag or paused filter, at most MAX_PAGE_SCAN jobs are looked at
+       per page, so a page can come back short, even empty, with more
+       pages to follow.
+
+       GET /jobs?stream=1 streams every job as one JSON object per
+       line.  The listing is serialized in small chunks from a
+       cooperative task which pauses while the client can't keep up, so
+       neither the response nor the time spent serializing grows with
+       the size of the scheduler.
+    """
+
+    actions = ('pause', 'resume', 'remove')
+
+    def getChild(self, name, request):
+        if name in self.actions:
+            return BulkActionResource(self.scheduler, name)
+        try:
+            return JobResource(self.scheduler, int(name))
+        except ValueError:
+            return resource.NoResource()
+
+    def render_GET(self, request):
+        if request.args.get('stream', ['0'])[0] not in ('', '0'):
+            return self._stream(request)
+
+        after = _intArg(request, 'after', 0)
+        limit = _intArg(request, 'limit', DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        tag = request.args.get('tag', [None])[0]
+        paused = request.args.get('paused', ['0'])[0] not in ('', '0')
+
+        page = []
+        scanned = 0
+        next_after = None
+        for job in self.scheduler.iterJobsAfter(after):
+            if len(page) == limit or scanned == MAX_PAGE_SCAN:
+                break
+            scanned += 1
+            next_after = job.job_id
+            if self._matches(job, tag, paused):
+                page.append(job)
+        else:
+            # Ran out of jobs.
+            next_after = None
+        return self.respond(request, {'after': after,
+                                      'limit': limit,
+                                      'next': next_after,
+                                      'jobs': map(describeJob, page)})
+
+    def _matches(self, job, tag, paused):
+        if tag is not None and job.tag != tag:
+            return False
+        if paused and not job._paused:
+            return False
+        return True
+
+    def _filter(self, jobs, tag, paused):
+        for job in jobs:
+            if self._matches(job, tag, paused):
+                yield job
+
+    def _stream(self, request):
+        request.setHeader('content-type', 'application/x-ndjson')
+        tag = request.args.get('tag', [None])[0]
+        paused = request.args.get('paused', ['0'])[0] not in ('', '0')
+
+        # Only the job references are copied up front; each job is
+        # serialized when its chunk is written.
+        jobs = self._filter(self.scheduler.getJobs(), tag, paused)
+        work = self.cooperator.cooperate(self._writeChunks(request, jobs))
+        producer = _TaskProducer(work)
+        request.registerProducer(producer, True)
+
+        def stop(reason):
+            producer.stopProducing()
+        request.notifyFinish().addErrback(stop)
+
+        def done(result):
+            request.unregisterProducer()
+            request.finish()
+        def failed(reason):
+            if not reason.check(task.TaskStopped):
+                log.err(reason)
+                request.unregisterProducer()
+                request.finish()
+        work.whenDone().addCallbacks(done, failed)
+        return server.NOT_DONE_YET
+
+    def _writeChunks(self, request, jobs):
+        while True:
+            chunk = list(islice(jobs, STREAM_CHUNK))
+            if not chunk:
+                break
+            request.write(''.join([json.dumps(describeJob(job)) + '\n'
+                                   for job in chunk]))
+            yield None
+
+class UpcomingResource(_JSONResource):
+    """GET /upcoming?limit=20: the next jobs due, soonest first."""
+
+    isLeaf = True
+
+    def render_GET(self, request):
+        limit = _intArg(request, 'limit', 20, MAX_PAGE_SIZE)
+        jobs = islice(self.scheduler.iterUpcomingJobs(), limit)
+        return self.respond(request, {'jobs': map(describeJob, jobs)})
+
+class FailuresResource(_JSONResource):
+    """GET /failures?limit=100: the most recent failed runs."""
+
+    isLeaf = True
+
+    def render_GET(self, request):
+        limit = _intArg(request, 'limit', 100, MAX_PAGE_SIZE)
+        failures = self.scheduler.getRecentFailures(limit)
+        return self.respond(request,
+                            {'failures': map(describeRecord, failures)})
+
+class AdminResource(_JSONResource):
+    """Root of the JSON admin interface of a Scheduler.
+
+       >>> root = AdminResource(sched)
+       >>> reactor.listenTCP(8080, server.Site(root), interface='127.0.0.1')
+
+       The interface has no authentication of its own, bind it to a
+       trusted interface or wrap it in a guarded resource.
+    """
+
+    def __init__(self, scheduler, cooperator=None):
+        if cooperator is None:
+            # Run streamed listings off the scheduler's clock.
+            cooperator = task.Cooperator(
+                scheduler=lambda x: scheduler.clock.callLater(0, x))
+
+        _JSONResource.__init__(self, scheduler, cooperator)
+        self.putChild('jobs', JobsResource(scheduler, cooperator))
+        self.putChild('upcoming', UpcomingResource(scheduler))
+        self.putChild('failures', FailuresResource(scheduler))
+
+    def render_GET(self, request):
+        sched = self.scheduler
+        return self.respond(request, {
+            'jobs': sched.getJobCount(),
+            'running': sched.running,
+            'executions': sched.executions,
+            'timers': len(sched.timers),
+        })